@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare memory and traversal time of ImageLayer with a __dict__ based layer
+
+run with: python -m benchmarks.image_layer [count]
+"""
+
+from __future__ import print_function
+import sys
+import time
+import tracemalloc
+
+from dockgraph.dockgraph import _intern
+from dockgraph.ImageLayer import ImageLayer
+from tests.helper import generate_valid_identifier
+
+
+class DictImageLayer(object):
+    """ImageLayer layout without __slots__ as reference"""
+
+    def __init__(self, identifier, tags=None, size=0):
+        # the same attributes as ImageLayer, so that only the layout differs
+        for name in ImageLayer.__slots__:
+            setattr(self, name, None)
+        self._identifier = identifier
+        self._tags = tags if tags is not None else []
+        self._size = size
+        self._children = []
+
+    @property
+    def children(self):
+        """:return: list of all children"""
+        return self._children
+
+    @property
+    def parent(self):
+        """:return: parent object"""
+        return self._parent
+
+    def is_head(self):
+        """:return True if this layer has no parent"""
+        return self._parent is None
+
+
+def build_chain(cls, identifiers):
+    """
+    build a chain of layers where each layer has one child and one tag of
+    100 interned tags like analyze_layers creates them
+    :param cls: the layer class to instantiate
+    :param identifiers: identifiers of the layers
+    :return: list of layers
+    """
+    layers = [
+        cls(identifier, tags=[_intern('image{0}:latest'.format(pos % 100))],
+            size=0)
+        for pos, identifier in enumerate(identifiers)
+    ]
+    for parent, child in zip(layers[:-1], layers[1:]):
+        parent._children.append(child)
+        child._parent = parent
+    return layers
+
+
+def measure(cls, identifiers):
+    """
+    :return: bytes allocated for the layers and seconds for a traversal
+    :rtype: tuple
+    """
+    tracemalloc.start()
+    layers = build_chain(cls, identifiers)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.time()
+    stack = [layers[0]]
+    while stack:
+        layer = stack.pop()
+        layer.is_head()
+        stack.extend(layer.children)
+    return allocated, time.time() - start
+
+
+def main(count=100000):
+    """run the benchmark and print the results"""
+    identifiers = [generate_valid_identifier() for _ in range(count)]
+    results = {}
+    for cls in (DictImageLayer, ImageLayer):
+        results[cls] = measure(cls, identifiers)
+        print('{0:>16}: {1:8.1f} bytes/layer  traversal {2:.3f}s'.format(
+            cls.__name__, results[cls][0] / float(count), results[cls][1]))
+    print('memory saved: {0:.0%}'.format(
+        1 - results[ImageLayer][0] / float(results[DictImageLayer][0])))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Time analyze, prune and render on synthetic daemons
+
+run with: python -m benchmarks.run [-h] [--sizes 1000 10000 100000]
+"""
+
+from __future__ import print_function
+import argparse
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+from dockgraph import dockgraph
+from dockgraph.printer import write_tree
+from tests.generator import generate_images
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def deep_chains(count, seed):
+    """:return: a few long base images with long images on top"""
+    return generate_images(
+        count, base_count=5, base_depth=(count // 20 or 1, count // 10 or 1),
+        image_depth=(20, 100), seed=seed)
+
+
+def wide_fanout(count, seed):
+    """:return: 10 base images with single layer images on top"""
+    return generate_images(
+        count, base_count=10, base_depth=(1, 1), image_depth=(1, 1),
+        untagged_ratio=0.0, seed=seed)
+
+
+def mostly_untagged(count, seed):
+    """:return: images with many intermediate layers, many dangling"""
+    return generate_images(
+        count, image_depth=(5, 15), untagged_ratio=0.5, seed=seed)
+
+
+def realistic(count, seed):
+    """:return: images with the default shape of the generator"""
+    return generate_images(count, seed=seed)
+
+
+SHAPES = (deep_chains, wide_fanout, mostly_untagged, realistic)
+
+
+def _render(layers, output_format):
+    """render all layers to memory"""
+    write_tree(dockgraph.get_heads(layers), io.StringIO(), output_format)
+
+
+def _get_heads_indexed(layers, tags):
+    """build the index and look up all tags"""
+    index = dockgraph.build_index(layers)
+    return [dockgraph.get_heads(layers, tag, index) for tag in tags]
+
+
+def operations(images):
+    """
+    :return: name and function of every benchmarked operation. Every function
+        gets the result of analyze_layers, except analyze_layers itself.
+    :rtype: list
+    """
+    tags = [
+        image['RepoTags'][0] for image in images
+        if image['RepoTags'] != ['<none>:<none>']
+    ]
+    some_tags = tags[::len(tags) // 100 or 1]
+    return [
+        ('analyze_layers', lambda _: dockgraph.analyze_layers(images)),
+        ('get_heads', lambda layers: [
+            dockgraph.get_heads(layers, tag) for tag in some_tags]),
+        ('get_heads (index)', lambda layers: _get_heads_indexed(
+            layers, some_tags)),
+        ('resolve_images', lambda layers: dockgraph.resolve_images(
+            layers, some_tags)),
+        ('remove_untagged_layers', dockgraph.remove_untagged_layers),
+        ('prune_untagged_layers', dockgraph.prune_untagged_layers),
+        ('print_tree text', lambda layers: _render(layers, 'text')),
+        ('print_tree json', lambda layers: _render(layers, 'json')),
+    ]
+
+
+def measure(func, arg, repeat=3):
+    """
+    :return: best seconds of repeat runs and peak memory in bytes of
+        func(arg), or None if it failed (e.g. because of the recursion limit)
+    :rtype: tuple
+    """
+    try:
+        seconds = None
+        for _ in range(repeat):
+            start = time.time()
+            func(arg)
+            if seconds is None or time.time() - start < seconds:
+                seconds = time.time() - start
+        tracemalloc.start()
+        func(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    except RuntimeError:  # RecursionError is a subclass
+        tracemalloc.stop()
+        return None
+    return seconds, peak
+
+
+def run(sizes, seed=0, repeat=3):
+    """
+    :return: results keyed by 'shape/size/operation'
+    :rtype: dict
+    """
+    results = {}
+    for shape in SHAPES:
+        for size in sizes:
+            images = shape(size, seed)
+            layers = dockgraph.analyze_layers(images)
+            for name, func in operations(images):
+                key = '{0}/{1}/{2}'.format(shape.__name__, size, name)
+                results[key] = measure(func, layers, repeat)
+                if results[key] is None:
+                    print('{0:<55} failed'.format(key))
+                else:
+                    print('{0:<55} {1:8.3f} s {2:8.1f} MiB'.format(
+                        key, results[key][0], results[key][1] / 1024.0**2))
+    return results
+
+
+def compare(results, baseline, tolerance, min_seconds=0.01):
+    """
+    :return: keys of the results more than tolerance (and min_seconds)
+        slower than baseline
+    :rtype: list
+    """
+    return [
+        key for key, result in sorted(results.items())
+        if result and baseline.get(key) and
+        result[0] > baseline[key][0] * (1 + tolerance) and
+        result[0] - baseline[key][0] > min_seconds
+    ]
+
+
+def main(argv=sys.argv[1:]):
+    """run the benchmarks and compare them with a baseline"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per operation, the best is reported')
+    parser.add_argument('--save', metavar='FILE',
+                        help='write the results as json to FILE')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='fail if slower than the results in FILE')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown for --compare (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.seed, args.repeat)
+    if args.save:
+        with open(args.save, 'w') as result_file:
+            json.dump(results, result_file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(
+                results, json.load(baseline_file), args.tolerance)
+        for key in regressions:
+            print('regression: {0}'.format(key))
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
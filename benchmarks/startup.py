@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the startup time of the cli with -X importtime
+
+run with: python -m benchmarks.startup [count]
+"""
+
+from __future__ import print_function
+import os
+import subprocess
+import sys
+import time
+
+from tests.test_startup import import_times, ROOTDIR
+
+SCENARIOS = (
+    ('parse_args', 'from bin import dockgraph_cli as cli; cli.parse_args([])'),
+    ('import engine', 'import dockgraph; dockgraph.analyze_layers'),
+)
+
+
+def main(count=5):
+    """print the slowest imports and the wall time of --help"""
+    for name, code in SCENARIOS:
+        times = import_times(code)
+        print('{0}: {1:.1f} ms imports'.format(
+            name, sum(times[mod] for mod in times if '.' not in mod) / 1e3))
+        slowest = sorted(times.items(), key=lambda item: -item[1])[:5]
+        for module, cumulative in slowest:
+            print('  {0:>8.1f} ms  {1}'.format(cumulative / 1e3, module))
+
+    environ = dict(os.environ, PYTHONPATH=ROOTDIR)
+    start = time.time()
+    for _ in range(count):
+        subprocess.check_call(
+            [sys.executable, os.path.join('bin', 'dockgraph'), '--help'],
+            cwd=ROOTDIR, env=environ, stdout=open(os.devnull, 'w'),
+        )
+    print('dockgraph --help: {0:.1f} ms'.format(
+        (time.time() - start) / count * 1e3))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -7,95 +7,63 @@ cli for dockgraph module
 """
 
 from __future__ import print_function
-import dockgraph
-import docker
 import sys
-import json
 import argparse
 try:
     import argcomplete
 except ImportError:
     pass
 
-
-def print_tree(heads, output_format='text', encoding='ascii'):
-    """
-    print a tree starting at heads to stdout
-    :param heads: heads of the tree
-    :param output_format: format of the printed tree, either text or json
-    :param encoding: the terminal encoding (ascii or utf-8)
-    """
-    encoding = encoding.upper()
-    if output_format == 'text':
-        out = ''
-        chars = {
-            'headstr': u'───' if encoding == 'UTF-8' else '--',
-            'chldstr': u'├──' if encoding == 'UTF-8' else '|-',
-            'laststr': u'└──' if encoding == 'UTF-8' else '`-',
-            'indtstr': u'│   ' if encoding == 'UTF-8' else '|  ',
-            'lastindtstr': '    ' if encoding == 'UTF-8' else '   ',
-        }
-        for head in heads:
-            out += _print_tree_wrap(head, indentation='', chars=chars)
-        out += "\n{0} heads, {1} layers".format(
-            len(heads), len(out.splitlines()))
-        return out
-    elif output_format == 'json':
-        return json.dumps([dict(layer) for layer in heads])
-    else:
-        raise ValueError("invalid output_format '{0}'".format(output_format))
-
-
-def _print_tree_wrap(layer, indentation, chars):
-    """
-    wrapper function for recursive implementation of print tree
-    :param indentation: indentation for the current layer
-    :param chars: characters that are used for formatting the lines
-    :return: the text output
-    :rtype: str
-    """
-    new_node = ''
-
-    is_last = layer.is_head() or layer == layer.parent.children[-1]
-    if layer.is_head():
-        new_node += u'{headstr} {lay}\n'.format(
-            headstr=chars['headstr'], lay=str(layer))
-    else:
-        chldstr = chars['laststr'] if is_last else chars['chldstr']
-        new_node += u'{ind}{chldstr} {lay}\n'.format(
-            ind=indentation, chldstr=chldstr, lay=str(layer))
-    for child in layer.children:
-        indtstr = chars['lastindtstr'] if is_last else chars['indtstr']
-        new_node += _print_tree_wrap(
-            layer=child,
-            indentation=indentation + indtstr,
-            chars=chars,
-        )
-    return new_node
+# seconds the tab completion waits for the docker daemon
+COMPLETION_TIMEOUT = 5
 
 
 def image_completer(prefix, **kwargs):
     """tab completion docker images"""
     if 'docker_images' not in kwargs.keys():
-        docker_cli = docker.Client()
-        images = docker_cli.images()
+        # don't ask the daemon on every completion and don't import the
+        # whole package for it
+        from dockgraph import api
+        api.configure(timeout=COMPLETION_TIMEOUT)
+        images = api.fetch_images(use_cache=True, check=False)
     else:
         images = kwargs['docker_images']
+    # only suggest ids of images, not of intermediate layers
+    parents = set(img['ParentId'] for img in images)
     suggestions = set()
     for img in images:
-        suggestions.update(img['RepoTags'] + [img['Id'][:12]])
+        suggestions.update(img['RepoTags'])
+        if img['Id'] not in parents or \
+                [t for t in img['RepoTags'] if t != '<none>:<none>']:
+            suggestions.add(img['Id'][:12])
     return (
         i for i in suggestions
         if i.startswith(prefix) and not i == '<none>:<none>'
     )
 
 
+def _non_negative_int(value):
+    """
+    argparse type of counts and limits
+    :param value: the value of the argument
+    :return: the value as int
+    :rtype: int
+    :raises argparse.ArgumentTypeError: if the value is negative
+    """
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(
+            '{0} is negative, expected 0 or more'.format(value))
+    return number
+
+
 def parse_args(argv=sys.argv[1:]):
     """
     :param argv: arguments which we get called with
     :return: the parsed arguments as object (see argparse doc)
     :rtype: object
     """
+    from dockgraph import cache
 
     parser = argparse.ArgumentParser(description=__doc__)
 
@@ -111,7 +79,7 @@ def parse_args(argv=sys.argv[1:]):
         '-f',
         '--format',
         dest='output_format',
-        choices=('text', 'json'),
+        choices=('text', 'json', 'ndjson'),
         default='text',
         help='the output format'
     )
@@ -124,6 +92,190 @@ def parse_args(argv=sys.argv[1:]):
         help='the output encoding'
     )
 
+    parser.add_argument(
+        '--sizes',
+        action='store_true',
+        default=False,
+        help='print the unique, shared and reclaimable size of the subtree '
+             'of every layer'
+    )
+
+    parser.add_argument(
+        '--max-depth',
+        type=_non_negative_int,
+        dest='max_depth',
+        default=None,
+        metavar='N',
+        help='print no layers more than N levels below the heads, a summary '
+             'of the hidden children is printed instead'
+    )
+    parser.add_argument(
+        '--max-children',
+        type=_non_negative_int,
+        dest='max_children',
+        default=None,
+        metavar='N',
+        help='print at most N children of every layer, a summary of the '
+             'hidden children is printed instead'
+    )
+
+    parser.add_argument(
+        '--paths',
+        action='store_true',
+        dest='focus',
+        default=False,
+        help='only print the paths from the base images to the given images'
+    )
+    parser.add_argument(
+        '--descendants',
+        action='store_true',
+        default=False,
+        help='with --paths, also print the layers built on the given images'
+    )
+
+    parser.add_argument(
+        '--top',
+        type=_non_negative_int,
+        default=None,
+        metavar='N',
+        help='only print the N largest layers with their descendants'
+    )
+    parser.add_argument(
+        '--sort',
+        choices=('size', 'children', 'depth'),
+        default='size',
+        help='order of --top: size the layer adds to its parent, number of '
+             'children or longest chain of descendants (default: '
+             '%(default)s)'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_false',
+        dest='use_cache',
+        default=True,
+        help='always fetch the images from the docker daemon'
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=int,
+        dest='cache_ttl',
+        default=cache.DEFAULT_TTL,
+        metavar='SECONDS',
+        help='maximum age of the cached image list (default: %(default)s)'
+    )
+
+    parser.add_argument(
+        '-H',
+        '--host',
+        action='append',
+        dest='hosts',
+        default=None,
+        metavar='URL',
+        help='docker daemon to ask, e.g. tcp://host:2375 (repeat it to '
+             'merge the images of several daemons)'
+    )
+    parser.add_argument(
+        '--timeout',
+        type=int,
+        default=None,
+        metavar='SECONDS',
+        help='seconds to wait for an answer of the docker daemon '
+             '(default: 60)'
+    )
+    parser.add_argument(
+        '--api-version',
+        dest='api_version',
+        default=None,
+        metavar='VERSION',
+        help='api version of the docker daemon, auto to ask the daemon'
+    )
+    parser.add_argument(
+        '--input',
+        dest='input_path',
+        default=None,
+        metavar='FILE',
+        help='read the image list from FILE (json array or json lines, - '
+             'for stdin) instead of asking the docker daemon'
+    )
+
+    parser.add_argument(
+        '--snapshot',
+        default=None,
+        metavar='FILE',
+        help='read the layers from a snapshot FILE instead of asking the '
+             'docker daemon'
+    )
+    parser.add_argument(
+        '--save-snapshot',
+        dest='save_snapshot',
+        default=None,
+        metavar='FILE',
+        help='save all layers to a snapshot FILE'
+    )
+
+    parser.add_argument(
+        '--diff',
+        nargs=2,
+        default=None,
+        metavar=('OLD', 'NEW'),
+        help='print the changes between two image lists or snapshots'
+    )
+
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        default=False,
+        help='keep the layers in memory and answer queries on the socket'
+    )
+    parser.add_argument(
+        '--refresh',
+        type=int,
+        dest='refresh_interval',
+        default=None,
+        metavar='SECONDS',
+        help='seconds between two refreshes of the served layers '
+             '(default: 30)'
+    )
+    parser.add_argument(
+        '--socket',
+        dest='socket_path',
+        default=None,
+        metavar='PATH',
+        help='unix socket of the server '
+             '(default: $XDG_RUNTIME_DIR/dockgraph-$UID.sock)'
+    )
+    parser.add_argument(
+        '--no-server',
+        action='store_false',
+        dest='use_server',
+        default=True,
+        help='do not ask a running server'
+    )
+
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        default=False,
+        help='print the duration of every phase to stderr'
+    )
+    parser.add_argument(
+        '--profile-dump',
+        dest='profile_dump',
+        default=None,
+        metavar='FILE',
+        help='write cProfile stats to FILE'
+    )
+
+    parser.add_argument(
+        '--images-from',
+        dest='images_from',
+        default=None,
+        metavar='FILE',
+        help='also print the images listed in FILE, one per line (- for '
+             'stdin)'
+    )
+
     parser.add_argument(
         'images',
         nargs='*',
@@ -135,7 +287,14 @@ def parse_args(argv=sys.argv[1:]):
     if 'argcomplete' in globals().keys():
         argcomplete.autocomplete(parser)
 
-    return parser.parse_args(argv)
+    args = parser.parse_args(argv)
+    if args.focus and args.top is not None:
+        parser.error('--paths cannot be combined with --top')
+    if args.focus and args.images == 'all' and args.images_from is None:
+        parser.error('--paths needs the images to print the paths to')
+    if args.descendants and not args.focus:
+        parser.error('--descendants needs --paths')
+    return args
 
 
 def main():
@@ -144,25 +303,294 @@ def main():
     """
     args = parse_args()
 
-    layers = dockgraph.analyze_layers()
+    from dockgraph import profiling
+
+    if args.profile or args.profile_dump:
+        profiler = profiling.Profiler(cprofile_path=args.profile_dump)
+    else:
+        profiler = profiling.NullProfiler()
+    try:
+        _run(args, profiler)
+    finally:
+        profiler.stop()
+        if args.profile:
+            print(profiler.report(), file=sys.stderr)
+
+
+def _run(args, profiler):
+    """
+    run the desired action
+    :param args: the parsed arguments
+    :param profiler: profiler to record the phases with
+    """
+    import os
+    import dockgraph
+    from dockgraph import api
+    from dockgraph import ingest
+    from dockgraph import profiling
+    from dockgraph import server
+    from dockgraph import snapshot
+    from dockgraph.LayerTable import LayerTable
+    from dockgraph.printer import write_tree
+
+    api.configure(timeout=args.timeout, version=args.api_version)
+    if args.images_from is not None:
+        specs = _read_specs(args.images_from)
+        if not specs and args.images == 'all':
+            # an empty list must not select all images
+            print("No images listed in {0}.".format(args.images_from),
+                  file=sys.stderr)
+            sys.exit(1)
+        args.images = specs if args.images == 'all' \
+            else args.images + specs
+    if args.diff:
+        from dockgraph import diff
+        with profiler.span('analyze'):
+            old, new = [diff.load_layers(path) for path in args.diff]
+        with profiler.span('diff'):
+            changes = diff.diff_layers(old, new)
+        with profiler.span('render'):
+            print(diff.print_diff(changes, args.output_format))
+        return
+
+    socket_path = args.socket_path or server.default_socket_path()
+    if args.serve:
+        server.serve(
+            socket_path,
+            fetch=_serve_fetch(args),
+            refresh_interval=args.refresh_interval or
+            server.DEFAULT_REFRESH_INTERVAL,
+        )
+        return
+
+    if _use_server(args) and os.path.exists(socket_path):
+        with profiler.span('query'):
+            if _query_server(args, socket_path):
+                return
+
+    table = None
+    with profiler.span('fetch'):
+        if args.snapshot:
+            table = snapshot.load(args.snapshot)
+        elif args.input_path:
+            # decoded while the layers are analyzed
+            images = ingest.read_images(args.input_path)
+        elif args.hosts:
+            try:
+                images = _fetch_hosts(args.hosts)
+            except RuntimeError as error:
+                print(error, file=sys.stderr)
+                sys.exit(1)
+        else:
+            images = dockgraph.fetch_images(
+                use_cache=args.use_cache, cache_ttl=args.cache_ttl)
+    if args.save_snapshot:
+        with profiler.span('snapshot'):
+            if table is None:
+                images = list(images)
+                table = LayerTable.from_images(images)
+            snapshot.save(table, args.save_snapshot)
+
+    # prune_untagged_layers caches the heads itself
+    with profiler.span('analyze'):
+        if args.snapshot:
+            layers = _snapshot_layers(table, args)
+            if args.print_intermediate:
+                dockgraph.compute_roots(layers)
+        else:
+            layers = dockgraph.analyze_layers(
+                images, with_roots=args.print_intermediate)
+    if args.sizes or args.max_depth is not None or \
+            args.max_children is not None:
+        # before pruning, so that the untagged layers are counted
+        with profiler.span('sizes'):
+            dockgraph.compute_subtree_sizes(layers)
+    profiler.count('layers', len(layers))
+    if profiler.enabled:
+        profiler.count('edges', sum(
+            1 for layer in layers.values() if not layer.is_head()))
     heads = []
+    children = None
 
     if not args.print_intermediate:
-        layers = dockgraph.remove_untagged_layers(layers)
+        with profiler.span('prune'):
+            tagged_layers = dockgraph.prune_untagged_layers(layers)
+        profiler.count('removed', len(layers) - len(tagged_layers))
+        layers = tagged_layers
 
-    if args.images == 'all':
-        heads = dockgraph.get_heads(layers)
-    else:
-        for image in args.images:
-            heads_for_image = dockgraph.get_heads(layers, image)
-            if not heads_for_image:
+    with profiler.span('resolve'):
+        if args.images == 'all':
+            heads = dockgraph.get_heads(layers)
+        else:
+            resolution = dockgraph.resolve_images(layers, args.images)
+            for image in resolution.missing:
                 print("No image found with id/name {0}.".format(image))
+            if resolution.missing:
                 sys.exit(1)
-            heads += heads_for_image
+            for image, matches in resolution.ambiguous:
+                print(
+                    "{0} is ambiguous, it matches {1} layers: {2}".format(
+                        image, len(matches), ', '.join(
+                            layer.identifier[:12] for layer in matches)
+                    ),
+                    file=sys.stderr
+                )
+            heads = resolution.heads
+            if args.focus:
+                heads, children = dockgraph.focus_layers(
+                    resolution.matches, args.descendants)
+        if args.top is not None:
+            heads = dockgraph.top_layers(
+                layers, args.top, args.sort,
+                heads=None if args.images == 'all' else heads)
+    profiler.count('heads', len(heads))
+
+    stream = sys.stdout
+    if profiler.enabled:
+        stream = profiling.CountingWriter(sys.stdout)
+    with profiler.span('render'):
+        write_tree(
+            heads, stream,
+            output_format=args.output_format, encoding=args.output_encoding,
+            sizes=args.sizes, children=children,
+            max_depth=args.max_depth, max_children=args.max_children,
+        )
+        stream.write('\n')
+    if profiler.enabled:
+        profiler.count('bytes', stream.written)
 
-    print(print_tree(
-        heads, output_format=args.output_format, encoding=args.output_encoding
-    ))
+
+def _use_server(args):
+    """
+    :param args: the parsed arguments
+    :return: False if the arguments ask for something a server does not
+        provide, e.g. other images than the ones of the local daemon or
+        fresher ones than the served ones
+    :rtype: bool
+    """
+    from dockgraph import cache
+
+    return args.use_server and not args.input_path and \
+        not args.hosts and not args.snapshot and \
+        not args.save_snapshot and args.top is None and \
+        args.use_cache and args.cache_ttl == cache.DEFAULT_TTL and \
+        args.timeout is None and args.api_version is None
+
+
+def _read_specs(path):
+    """
+    :param path: path of a file with one image per line, '-' for stdin
+    :return: the images of the file without empty lines and comments
+    :rtype: list
+    """
+    import io
+
+    if path == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with io.open(path, encoding='utf-8') as spec_file:
+            lines = spec_file.readlines()
+    return [
+        line.strip() for line in lines
+        if line.strip() and not line.strip().startswith('#')
+    ]
+
+
+def _snapshot_layers(table, args):
+    """
+    materialize the trees of the requested images of a snapshot
+    :param table: the LayerTable of the snapshot
+    :param args: the parsed arguments
+    :return: dict of the layers like analyze_layers
+    :rtype: dict
+    """
+    if args.images == 'all':
+        return table.to_dict()
+    heads = []
+    seen = set()
+    for image in args.images:
+        for head in table.get_heads(image):
+            if head not in seen:
+                seen.add(head)
+                heads.append(head)
+    return table.to_dict(heads)
+
+
+def _serve_fetch(args):
+    """
+    :param args: the parsed arguments
+    :return: function returning the image list for the server or None to
+        ask the local daemon
+    :rtype: function
+    """
+    from dockgraph import ingest
+
+    if args.input_path == '-':
+        # stdin can be read only once, every refresh serves the same images
+        images = list(ingest.read_images('-'))
+        return lambda: images
+    if args.input_path:
+        return lambda: list(ingest.read_images(args.input_path))
+    if args.hosts:
+        return lambda: _fetch_hosts(args.hosts)
+    return None
+
+
+def _fetch_hosts(hosts):
+    """
+    fetch and merge the images of several docker daemons, the daemons that
+    could not be asked are reported on stderr
+    :param hosts: base urls of the daemons
+    :return: merged list of dicts of images (see api.fetch_hosts)
+    :rtype: list
+    :raises RuntimeError: if none of the daemons could be asked
+    """
+    from dockgraph import api
+
+    errors = []
+    images = api.fetch_hosts(hosts, errors=errors)
+    for base_url, error in errors:
+        print('Could not ask {0}: {1}'.format(base_url, error),
+              file=sys.stderr)
+    if len(errors) == len(hosts):
+        raise RuntimeError('None of the docker daemons could be asked.')
+    return images
+
+
+def _query_server(args, socket_path):
+    """
+    print the tree answered by a running server
+    :param args: the parsed arguments
+    :param socket_path: path of the unix socket of the server
+    :return: False if no server is listening on the socket or it did not
+        answer properly
+    :rtype: bool
+    """
+    import socket
+    from dockgraph import server
+
+    try:
+        header = server.query(
+            [] if args.images == 'all' else args.images,
+            intermediate=args.print_intermediate,
+            output_format=args.output_format,
+            encoding=args.output_encoding,
+            socket_path=socket_path,
+            sizes=args.sizes,
+            focus=args.focus,
+            descendants=args.descendants,
+            max_depth=args.max_depth,
+            max_children=args.max_children,
+        )
+    except (socket.error, ValueError):
+        return False
+    if 'error' in header:
+        print(header['error'])
+        sys.exit(1)
+    for note in header['notes']:
+        print(note, file=sys.stderr)
+    sys.stdout.write('\n')
+    return True
 
 
 if __name__ == '__main__':
@@ -4,13 +4,24 @@
 Tools to make a tree data structure for Docker layers
 """
 
+from collections import namedtuple
+
+# disk usage of the subtree of a layer, see dockgraph.compute_subtree_sizes
+SubtreeSizes = namedtuple(
+    'SubtreeSizes', ('unique', 'shared', 'reclaimable', 'descendants'))
+
 
 class ImageLayer(object):
     """
     abstraction of a docker image layer
     """
 
-    def __init__(self, identifier, tags=None, size=0):
+    __slots__ = (
+        '_identifier', '_tags', '_size', '_parent', '_children', '_root',
+        '_subtree', '_hosts',
+    )
+
+    def __init__(self, identifier, tags=None, size=0, hosts=None):
         """
         create and initialize a new ImageLayer object
         :param identifier: unique string
@@ -18,6 +29,8 @@ class ImageLayer(object):
         :param parent: parent as ImageLayer object
         :param tags: list of tags in unicode
         :param size: size of the layer in bytes
+        :param hosts: list of the docker daemons the layer was found on
+            (optional, see api.fetch_hosts)
         """
 
         self._identifier = identifier
@@ -25,16 +38,22 @@ class ImageLayer(object):
         self._size = size
         self._parent = None
         self._children = []
+        self._root = None
+        self._subtree = None
+        self._hosts = hosts
 
     def __str__(self):
         """
         :return: a printable description of an ImageLayer object as string
         """
-        return u'{layer_id} Tags: {layer_tag} Size: {layer_size}'.format(
+        text = u'{layer_id} Tags: {layer_tag} Size: {layer_size}'.format(
             layer_id=self._identifier[:12],
             layer_tag=str(self._tags),
             layer_size=_convert_size(self.size),
         )
+        if self._hosts is not None:
+            text += u' Hosts: {0}'.format(str(self._hosts))
+        return text
 
     def __iter__(self):
         """makes ImageLayer object iterable (e.g. for dict(layer))"""
@@ -42,6 +61,8 @@ class ImageLayer(object):
         yield('ParentId', self.parent.identifier if self.parent else '')
         yield('RepoTags', self.tags)
         yield('VirtualSize', self.size)
+        if self.hosts is not None:
+            yield('Hosts', self.hosts)
         yield('Children', [dict(child) for child in self.children])
 
     @staticmethod
@@ -61,6 +82,8 @@ class ImageLayer(object):
             if not self.is_head():
                 self.parent.children.append(child)
         self.children = []
+        self.root = None
+        self.subtree = None
         if not self.is_head():
             self.parent.children.remove(self)
             self.parent = None
@@ -104,6 +127,48 @@ class ImageLayer(object):
         """
         self._parent = parent
 
+    @property
+    def root(self):
+        """
+        get the head of the tree this layer belongs to.
+        The pointer cached by dockgraph.compute_roots is used if present,
+        otherwise the parent chain is walked up to the head.
+        :return: head of the tree
+        :rtype: object
+        """
+        if self._root is not None:
+            return self._root
+        root = self
+        while not root.is_head():
+            root = root.parent
+        return root
+
+    @root.setter
+    def root(self, root):
+        """
+        cache the head of the tree this layer belongs to
+        :param root: head object or None to drop the cached pointer
+        """
+        self._root = root
+
+    @property
+    def subtree(self):
+        """
+        get the disk usage of the subtree of this layer as cached by
+        dockgraph.compute_subtree_sizes
+        :return: the sizes or None if they were not computed
+        :rtype: SubtreeSizes
+        """
+        return self._subtree
+
+    @subtree.setter
+    def subtree(self, subtree):
+        """
+        cache the disk usage of the subtree of this layer
+        :param subtree: SubtreeSizes or None to drop the cached sizes
+        """
+        self._subtree = subtree
+
     @property
     def identifier(self):
         """
@@ -139,6 +204,16 @@ class ImageLayer(object):
         """
         return self._size
 
+    @property
+    def hosts(self):
+        """
+        get the docker daemons the layer was found on
+        :return: list of the base urls of the daemons or None if the layers
+            of a single daemon were analyzed
+        :rtype: list
+        """
+        return self._hosts
+
 
 def _convert_size(size):
     """
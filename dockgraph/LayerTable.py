@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+
+"""
+Array based representation of the tree of Docker layers
+"""
+
+from __future__ import absolute_import
+from array import array
+
+from .ImageLayer import ImageLayer
+from .PrefixIndex import PrefixIndex
+
+try:
+    array('q')
+    INT64 = 'q'
+except ValueError:  # python 2
+    INT64 = 'd'
+
+
+class LayerTable(object):
+    """
+    columnar representation of the layer tree. Every layer is identified by
+    its position, layers are stored in pre-order so that every parent comes
+    before its children and the subtree of layer i spans the positions
+    i to i + subtree_count(i) - 1.
+    """
+
+    def __init__(self, identifiers, parents, sizes, tag_offsets, tag_names,
+                 children=None, roots=None, index=None):
+        """
+        create a LayerTable from columns that are already in pre-order
+        :param identifiers: list of layer identifiers
+        :param parents: array of parent positions, -1 for heads
+        :param sizes: array of layer sizes in bytes
+        :param tag_offsets: array of len(identifiers) + 1 offsets, the tags
+            of layer i are tag_names[tag_offsets[i]:tag_offsets[i+1]]
+        :param tag_names: list of all tags
+        :param children: (child_offsets, child_positions) if they are
+            already known, e.g. from a snapshot (optional)
+        :param roots: result of roots() if it is already known (optional)
+        :param index: prefix index over the identifiers and tags mapping to
+            positions if it is already known (optional)
+        """
+        self.identifiers = identifiers
+        self.parents = parents
+        self.sizes = sizes
+        self.tag_offsets = tag_offsets
+        self.tag_names = tag_names
+        if children is None:
+            children = _build_children(parents)
+        self.child_offsets, self.child_positions = children
+        self._positions = None
+        self._index = index
+        self._roots = roots
+
+    @classmethod
+    def from_images(cls, images):
+        """
+        build a LayerTable from the image list of the docker api.
+        Layers with a ParentId that is not in the list become heads.
+        :param images: list of dicts of images provided by docker api
+        :return: the table
+        :rtype: LayerTable
+        """
+        images = list(images)
+        positions = dict(
+            (image['Id'], pos) for pos, image in enumerate(images))
+        parents = array('l', (
+            positions.get(image['ParentId'], -1) for image in images))
+
+        # visit the layers in pre-order to get the order of the table
+        child_offsets, child_positions = _build_children(parents)
+        order = []
+        stack = [pos for pos in range(len(images) - 1, -1, -1)
+                 if parents[pos] == -1]
+        while stack:
+            pos = stack.pop()
+            order.append(pos)
+            stack.extend(reversed(
+                child_positions[child_offsets[pos]:child_offsets[pos + 1]]))
+
+        new_positions = array('l', [0] * len(images))
+        for new_pos, pos in enumerate(order):
+            new_positions[pos] = new_pos
+        tag_offsets = array('l', [0])
+        tag_names = []
+        for pos in order:
+            tag_names.extend(
+                tag for tag in images[pos]['RepoTags']
+                if tag != '<none>:<none>'
+            )
+            tag_offsets.append(len(tag_names))
+        return cls(
+            identifiers=[images[pos]['Id'] for pos in order],
+            parents=array('l', (
+                new_positions[parents[pos]] if parents[pos] != -1 else -1
+                for pos in order
+            )),
+            sizes=array(INT64, (images[pos]['VirtualSize'] for pos in order)),
+            tag_offsets=tag_offsets,
+            tag_names=tag_names,
+        )
+
+    def __len__(self):
+        """:return: the number of layers"""
+        return len(self.identifiers)
+
+    def position(self, identifier):
+        """
+        :param identifier: identifier of a layer
+        :return: position of the layer in the table
+        :rtype: int
+        """
+        if self._positions is None:
+            self._positions = dict(
+                (layer_id, pos)
+                for pos, layer_id in enumerate(self.identifiers)
+            )
+        return self._positions[identifier]
+
+    def tags(self, pos):
+        """
+        :param pos: position of a layer
+        :return: tags of the layer
+        :rtype: list
+        """
+        return self.tag_names[self.tag_offsets[pos]:self.tag_offsets[pos + 1]]
+
+    def children(self, pos):
+        """
+        :param pos: position of a layer
+        :return: positions of the children of the layer
+        :rtype: array
+        """
+        return self.child_positions[
+            self.child_offsets[pos]:self.child_offsets[pos + 1]]
+
+    def roots(self):
+        """
+        :return: the position of the head of every layer
+        :rtype: array
+        """
+        if self._roots is None:
+            self._roots = array('l', range(len(self)))
+            for pos, parent in enumerate(self.parents):
+                if parent != -1:
+                    self._roots[pos] = self._roots[parent]
+        return self._roots
+
+    def subtree_sum(self, values):
+        """
+        sum up values over the subtree of every layer
+        :param values: sequence with one value per layer
+        :return: the sum of values of each layer and all of its descendants
+        :rtype: array
+        """
+        sums = array(INT64, values)
+        for pos in range(len(self) - 1, -1, -1):
+            if self.parents[pos] != -1:
+                sums[self.parents[pos]] += sums[pos]
+        return sums
+
+    def subtree_counts(self):
+        """
+        :return: number of layers in the subtree of every layer (incl. itself)
+        :rtype: array
+        """
+        return self.subtree_sum([1] * len(self))
+
+    def deltas(self):
+        """
+        :return: size of every layer minus the size of its parent
+        :rtype: array
+        """
+        return array(INT64, (
+            size - self.sizes[parent] if parent != -1 else size
+            for size, parent in zip(self.sizes, self.parents)
+        ))
+
+    def find(self, prefix):
+        """
+        :param prefix: (abbreviated) layer id or [repository]:[tag]
+        :return: positions of all layers whose id or one of its tags starts
+            with prefix
+        :rtype: list
+        """
+        if self._index is None:
+            pairs = []
+            for pos, identifier in enumerate(self.identifiers):
+                pairs.append((identifier, pos))
+                pairs.extend((tag, pos) for tag in self.tags(pos))
+            self._index = PrefixIndex(pairs)
+        return self._index.find(prefix)
+
+    def get_heads(self, for_image=None):
+        """
+        return the head(s) of the specified image or all heads of the table
+        :param for_image: image to get heads for
+        :return: positions of the heads
+        :rtype: list
+        """
+        if not for_image:
+            return [pos for pos, parent in enumerate(self.parents)
+                    if parent == -1]
+        roots = self.roots()
+        return [roots[pos] for pos in self.find(for_image)]
+
+    def remove_untagged_layers(self):
+        """
+        build a new table without untagged layers in one pass. Every tagged
+        layer is linked to its nearest tagged ancestor.
+        :return: table without untagged layers
+        :rtype: LayerTable
+        """
+        # position of the nearest tagged ancestor (or itself) in the new table
+        tagged_ancestor = array('l', [-1] * len(self))
+        identifiers = []
+        parents = array('l')
+        sizes = array(INT64)
+        tag_offsets = array('l', [0])
+        tag_names = []
+        for pos, parent in enumerate(self.parents):
+            ancestor = tagged_ancestor[parent] if parent != -1 else -1
+            tags = self.tags(pos)
+            if not tags:
+                tagged_ancestor[pos] = ancestor
+                continue
+            tagged_ancestor[pos] = len(identifiers)
+            identifiers.append(self.identifiers[pos])
+            parents.append(ancestor)
+            sizes.append(self.sizes[pos])
+            tag_names.extend(tags)
+            tag_offsets.append(len(tag_names))
+        return LayerTable(identifiers, parents, sizes, tag_offsets, tag_names)
+
+    def to_layers(self, heads=None):
+        """
+        materialize the subtrees of heads (default: all) as ImageLayers,
+        e.g. to print them
+        :param heads: positions of the layers to start at
+        :return: the materialized layers in the order of heads
+        :rtype: list
+        """
+        if heads is None:
+            heads = self.get_heads()
+        result = []
+        for head in heads:
+            end = head + self.subtree_count(head)
+            layers = {}
+            for pos in range(head, end):
+                layer = ImageLayer(
+                    identifier=self.identifiers[pos],
+                    tags=self.tags(pos),
+                    size=self.sizes[pos],
+                )
+                layers[pos] = layer
+                if pos != head:
+                    ImageLayer.join_parent_child(
+                        parent=layers[self.parents[pos]], child=layer)
+            result.append(layers[head])
+        return result
+
+    def to_dict(self, heads=None):
+        """
+        materialize the subtrees of heads (default: all) as ImageLayers
+        :param heads: positions of the layers to start at
+        :return: dict of the materialized layers like analyze_layers, in
+            pre-order
+        :rtype: dict
+        """
+        layers = {}
+        stack = list(reversed(self.to_layers(heads)))
+        while stack:
+            layer = stack.pop()
+            layers[layer.identifier] = layer
+            stack.extend(reversed(layer.children))
+        return layers
+
+    def subtree_count(self, pos):
+        """
+        :param pos: position of a layer
+        :return: number of layers in the subtree of the layer (incl. itself)
+        :rtype: int
+        """
+        # in pre-order the subtree ends at the first layer whose parent comes
+        # before pos (an ancestor of pos) or which is a head
+        end = pos + 1
+        while end < len(self) and self.parents[end] >= pos:
+            end += 1
+        return end - pos
+
+
+def _build_children(parents):
+    """
+    compute the children of every layer in compressed sparse row format
+    :param parents: array of parent positions, -1 for heads
+    :return: offsets and positions, the children of layer i are
+        positions[offsets[i]:offsets[i+1]]
+    :rtype: tuple
+    """
+    offsets = array('l', [0] * (len(parents) + 1))
+    for parent in parents:
+        if parent != -1:
+            offsets[parent + 1] += 1
+    for pos in range(len(parents)):
+        offsets[pos + 1] += offsets[pos]
+    fill = array('l', offsets)
+    positions = array('l', [0] * offsets[-1])
+    for pos, parent in enumerate(parents):
+        if parent != -1:
+            positions[fill[parent]] = pos
+            fill[parent] += 1
+    return offsets, positions
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Sorted index to resolve (abbreviated) layer ids and tags by prefix
+"""
+
+import bisect
+
+
+class PrefixIndex(object):
+    """
+    sorted array of keys (layer ids and tags) mapping to layer identifiers
+    """
+
+    def __init__(self, pairs=None):
+        """
+        create a new PrefixIndex
+        :param pairs: iterable of (key, identifier) tuples (optional)
+        """
+        pairs = sorted(pairs or [], key=lambda pair: pair[0])
+        self._keys = [key for key, _ in pairs]
+        self._values = [value for _, value in pairs]
+
+    @classmethod
+    def from_sorted(cls, keys, values):
+        """
+        create a PrefixIndex from keys that are already sorted without
+        copying them, e.g. lazily decoded keys of a snapshot. add and remove
+        only work if keys and values are lists.
+        :param keys: sorted sequence of keys
+        :param values: sequence of the value of every key
+        :return: the index
+        :rtype: PrefixIndex
+        """
+        index = cls()
+        index._keys = keys
+        index._values = values
+        return index
+
+    def __len__(self):
+        """:return: the number of keys in the index"""
+        return len(self._keys)
+
+    def add(self, key, value):
+        """
+        insert a key into the index
+        :param key: layer id or tag
+        :param value: identifier of the layer the key belongs to
+        """
+        pos = bisect.bisect_right(self._keys, key)
+        self._keys.insert(pos, key)
+        self._values.insert(pos, value)
+
+    def remove(self, key, value):
+        """
+        remove a key from the index, does nothing if it is not indexed
+        :param key: layer id or tag
+        :param value: identifier of the layer the key belongs to
+        """
+        pos = bisect.bisect_left(self._keys, key)
+        while pos < len(self._keys) and self._keys[pos] == key:
+            if self._values[pos] == value:
+                del self._keys[pos]
+                del self._values[pos]
+                return
+            pos += 1
+
+    def find(self, prefix):
+        """
+        look up all layers with an id or tag starting with prefix
+        :param prefix: (abbreviated) layer id or tag
+        :return: identifiers of the matching layers without duplicates
+        :rtype: list
+        """
+        found = []
+        seen = set()
+        pos = bisect.bisect_left(self._keys, prefix)
+        while pos < len(self._keys) and self._keys[pos].startswith(prefix):
+            if self._values[pos] not in seen:
+                seen.add(self._values[pos])
+                found.append(self._values[pos])
+            pos += 1
+        return found
@@ -1 +1,42 @@
-from .dockgraph import analyze_layers, get_heads, remove_untagged_layers
+import sys
+
+# functions of the package and the module they are imported from on first
+# access, so that e.g. the tab completion does not load the whole package
+_EXPORTS = {
+    'analyze_layers': 'dockgraph',
+    'analyze_table': 'dockgraph',
+    'build_index': 'dockgraph',
+    'compute_roots': 'dockgraph',
+    'compute_subtree_sizes': 'dockgraph',
+    'fetch_hosts': 'api',
+    'fetch_images': 'api',
+    'find_layers': 'dockgraph',
+    'focus_layers': 'dockgraph',
+    'get_heads': 'dockgraph',
+    'prune_untagged_layers': 'dockgraph',
+    'read_images': 'ingest',
+    'remove_untagged_layers': 'dockgraph',
+    'resolve_images': 'dockgraph',
+    'top_layers': 'dockgraph',
+}
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """import the exported functions lazily (PEP 562)"""
+        if name not in _EXPORTS:
+            raise AttributeError(
+                "module 'dockgraph' has no attribute '{0}'".format(name))
+        import importlib
+        module = importlib.import_module('.' + _EXPORTS[name], __name__)
+        return getattr(module, name)
+
+    def __dir__():
+        """:return: the names of the package including the lazy ones"""
+        return sorted(list(globals().keys()) + list(_EXPORTS.keys()))
+else:
+    from .api import fetch_hosts, fetch_images
+    from .dockgraph import analyze_layers, analyze_table, build_index, \
+        compute_roots, compute_subtree_sizes, find_layers, focus_layers, \
+        get_heads, prune_untagged_layers, remove_untagged_layers, \
+        resolve_images, top_layers
+    from .ingest import read_images
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fetch the image list from the docker api.
+"""
+
+from __future__ import absolute_import
+import threading
+
+from . import cache
+
+# seconds to wait for an answer of the docker daemon
+DEFAULT_TIMEOUT = 60
+
+# settings of the clients created by get_client, see configure
+_settings = {'base_url': None, 'timeout': DEFAULT_TIMEOUT, 'version': None}
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def configure(base_url=None, timeout=None, version=None):
+    """
+    set the defaults of the clients created by get_client
+    :param base_url: url of the docker daemon (default: the local socket)
+    :param timeout: seconds to wait for an answer of the daemon
+    :param version: api version of the daemon, pinned to skip asking the
+        daemon for it ('auto' to ask)
+    """
+    if base_url is not None:
+        _settings['base_url'] = base_url
+    if timeout is not None:
+        _settings['timeout'] = timeout
+    if version is not None:
+        _settings['version'] = version
+
+
+def get_client(base_url=None, timeout=None, version=None):
+    """
+    return the docker client for the given settings. It is created on the
+    first call and shared by all later calls of the process, so that the
+    connection to the daemon is reused.
+    :param base_url: url of the docker daemon (default: see configure)
+    :param timeout: seconds to wait for an answer (default: see configure)
+    :param version: api version of the daemon (default: see configure)
+    :return: docker client
+    :rtype: docker.Client
+    """
+    key = (
+        base_url or _settings['base_url'],
+        timeout if timeout is not None else _settings['timeout'],
+        version or _settings['version'],
+    )
+    with _clients_lock:
+        if key not in _clients:
+            import docker
+            _clients[key] = docker.Client(
+                base_url=key[0], timeout=key[1], version=key[2])
+        return _clients[key]
+
+
+def fetch_all_layers(docker_cli=None):
+    """
+    :param docker_cli: docker client to use (default: get_client())
+    :return: a list of all image layers as dict generated by docker api
+    """
+    if docker_cli is None:
+        docker_cli = get_client()
+    return docker_cli.images(all=True)
+
+
+def fetch_images(use_cache=False, cache_ttl=cache.DEFAULT_TTL, check=True):
+    """
+    fetch all image layers from the docker api or the on-disk cache
+    :param use_cache: use and update the cache (see dockgraph.cache)
+    :param cache_ttl: maximum age of the cache in seconds
+    :param check: ask the daemon whether the cached list is still valid,
+        otherwise only the age of the cache is checked
+    :return: a list of all image layers as dict generated by docker api
+    :rtype: list
+    """
+    if not use_cache:
+        return fetch_all_layers()
+    if not check:
+        # a fresh cache is used without loading the docker client
+        images = cache.load(ttl=cache_ttl)
+        if images is not None:
+            return images
+    docker_cli = get_client()
+    images = cache.load(docker_cli if check else None, ttl=cache_ttl)
+    if images is None:
+        images = fetch_all_layers(docker_cli)
+        cache.store(images, docker_cli)
+    return images
+
+
+def fetch_hosts(base_urls, fetch=None, workers=None, errors=None):
+    """
+    fetch the image lists of several docker daemons in parallel and merge
+    them, so that it takes as long as the slowest daemon
+    :param base_urls: urls of the daemons, e.g. tcp://host:2375 or
+        unix://var/run/docker.sock
+    :param fetch: function returning the image list of a base url
+        (default: ask the daemon with the client of get_client)
+    :param workers: number of threads (default: one per daemon)
+    :param errors: list to append (base url, exception) to for every daemon
+        that could not be asked, the images of the others are merged
+        (optional, default: raise the first exception)
+    :return: merged list of dicts of images (see merge_images)
+    :rtype: list
+    """
+    from multiprocessing.pool import ThreadPool
+    base_urls = list(base_urls)
+    fetch = fetch or _fetch_host
+    pool = ThreadPool(workers or len(base_urls) or 1)
+    try:
+        results = pool.map(lambda url: _try_fetch(fetch, url), base_urls)
+    finally:
+        pool.close()
+    host_images = []
+    for base_url, (images, error) in zip(base_urls, results):
+        if error is None:
+            host_images.append((base_url, images))
+        elif errors is None:
+            raise error
+        else:
+            errors.append((base_url, error))
+    return merge_images(host_images)
+
+
+def merge_images(host_images):
+    """
+    merge the image lists of several daemons by the image id. The tags of an
+    image are the union of its tags on all daemons.
+    :param host_images: iterable of (host, list of dicts of images) tuples
+    :return: list of dicts of images, each with the additional key Hosts
+        listing the hosts the image was found on
+    :rtype: list
+    """
+    merged = {}
+    images = []
+    for host, host_list in host_images:
+        for image in host_list:
+            known = merged.get(image['Id'])
+            if known is None:
+                known = dict(image, RepoTags=list(image['RepoTags']), Hosts=[])
+                merged[image['Id']] = known
+                images.append(known)
+            else:
+                known['RepoTags'] = [
+                    tag for tag in known['RepoTags'] if tag != '<none>:<none>'
+                ]
+                known['RepoTags'] += [
+                    tag for tag in image['RepoTags']
+                    if tag != '<none>:<none>' and tag not in known['RepoTags']
+                ]
+                if not known['RepoTags']:
+                    known['RepoTags'] = ['<none>:<none>']
+            known['Hosts'].append(host)
+    return images
+
+
+def _try_fetch(fetch, base_url):
+    """
+    :return: the image list of the daemon and None or None and the exception
+        raised while asking it
+    :rtype: tuple
+    """
+    try:
+        return fetch(base_url), None
+    except Exception as error:  # unreachable, timeout, api error, ...
+        return None, error
+
+
+def _fetch_host(base_url):
+    """
+    :param base_url: url of the docker daemon
+    :return: the image list of the daemon
+    :rtype: list
+    """
+    return fetch_all_layers(get_client(base_url))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cache the image list of the docker api on disk.
+"""
+
+import os
+import time
+
+# seconds a cached image list is used at most
+DEFAULT_TTL = 60
+
+# event states of the docker api that change the image list
+IMAGE_EVENTS = ('pull', 'tag', 'untag', 'delete', 'import', 'load', 'commit')
+
+
+def cache_path(name='images'):
+    """
+    :param name: name of the cache file without extension
+    :return: path of the cache file below $XDG_CACHE_HOME (or ~/.cache)
+    :rtype: str
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'dockgraph', name + '.json')
+
+
+def load(docker_cli=None, ttl=DEFAULT_TTL, path=None):
+    """
+    load the cached image list if it is still valid
+    :param docker_cli: docker client to check if the daemon has changed since
+        the list was cached (optional, only the ttl is checked without it)
+    :param ttl: maximum age of the cache in seconds
+    :param path: path of the cache file (default: cache_path())
+    :return: list of dicts of images or None if there is no valid cache
+    :rtype: list
+    """
+    import json
+    try:
+        with open(path or cache_path()) as cache_file:
+            cached = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return None
+    if time.time() - cached['created'] > ttl:
+        return None
+    if docker_cli is not None and _daemon_changed(docker_cli, cached):
+        return None
+    return cached['images']
+
+
+def store(images, docker_cli=None, path=None):
+    """
+    write the image list to the cache
+    :param images: list of dicts of images provided by docker api
+    :param docker_cli: docker client to fingerprint the daemon (optional)
+    :param path: path of the cache file (default: cache_path())
+    """
+    import json
+    import tempfile
+    path = path or cache_path()
+    cached = {
+        'created': time.time(),
+        'count': docker_cli.info()['Images'] if docker_cli else None,
+        'images': images,
+    }
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    # write to a temporary file first, concurrent readers never see a
+    # partially written cache
+    handle, tmp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(handle, 'w') as cache_file:
+        json.dump(cached, cache_file)
+    os.rename(tmp_path, path)
+
+
+def _daemon_changed(docker_cli, cached):
+    """
+    :param docker_cli: docker client
+    :param cached: the content of the cache file
+    :return: True if the image count differs or there were image events
+        since the cache was created
+    :rtype: bool
+    """
+    if docker_cli.info()['Images'] != cached['count']:
+        return True
+    events = docker_cli.events(
+        since=int(cached['created']), until=int(time.time()), decode=True)
+    for event in events:
+        if event.get('Type') == 'image' or \
+                event.get('status') in IMAGE_EVENTS:
+            return True
+    return False
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compare the layers of two image lists or snapshots.
+"""
+
+from __future__ import absolute_import
+from collections import namedtuple, OrderedDict
+import json
+
+from .ImageLayer import _convert_size
+
+# changes between two trees, lists of records (see diff_layers)
+LayerDiff = namedtuple(
+    'LayerDiff', ('added', 'removed', 'retagged', 'reparented'))
+
+
+def load_layers(path):
+    """
+    analyze the layers of a file
+    :param path: path of a snapshot (see dockgraph.snapshot) or of a json
+        image list (see dockgraph.ingest), '-' for stdin
+    :return: dict of all layers like analyze_layers
+    :rtype: dict
+    """
+    from . import dockgraph
+    from . import ingest
+    from . import snapshot
+
+    if path != '-':
+        with open(path, 'rb') as layer_file:
+            is_snapshot = layer_file.read(len(snapshot.MAGIC)) == \
+                snapshot.MAGIC
+        if is_snapshot:
+            return snapshot.load(path).to_dict()
+    return dockgraph.analyze_layers(ingest.read_images(path))
+
+
+def diff_layers(old, new):
+    """
+    compare two trees by the identifiers of their layers with set operations
+    :param old: dict containing all layers of the old tree
+    :param new: dict containing all layers of the new tree
+    :return: the added and removed layers (with the size they add to their
+        parent), the layers whose tags changed and the layers whose parent
+        changed (with the change of their size), in the order of the trees
+    :rtype: LayerDiff
+    """
+    added = [
+        _layer_record(layer) for layer_id, layer in new.items()
+        if layer_id not in old
+    ]
+    removed = [
+        _layer_record(layer) for layer_id, layer in old.items()
+        if layer_id not in new
+    ]
+    retagged = []
+    reparented = []
+    for layer_id, layer in new.items():
+        old_layer = old.get(layer_id)
+        if old_layer is None:
+            continue
+        if set(old_layer.tags) != set(layer.tags):
+            retagged.append(OrderedDict([
+                ('Id', layer_id),
+                ('OldTags', old_layer.tags),
+                ('NewTags', layer.tags),
+            ]))
+        if _parent_id(old_layer) != _parent_id(layer):
+            reparented.append(OrderedDict([
+                ('Id', layer_id),
+                ('OldParentId', _parent_id(old_layer)),
+                ('NewParentId', _parent_id(layer)),
+                ('SizeDelta', layer.size - old_layer.size),
+            ]))
+    return LayerDiff(added, removed, retagged, reparented)
+
+
+def print_diff(diff, output_format='text'):
+    """
+    render the changes between two trees
+    :param diff: the result of diff_layers
+    :param output_format: text, json or ndjson
+    :return: the rendered changes
+    :rtype: str
+    """
+    added_size = sum(record['Size'] for record in diff.added)
+    removed_size = sum(record['Size'] for record in diff.removed)
+    if output_format == 'json':
+        return json.dumps(OrderedDict([
+            ('Added', diff.added),
+            ('Removed', diff.removed),
+            ('Retagged', diff.retagged),
+            ('Reparented', diff.reparented),
+            ('AddedSize', added_size),
+            ('RemovedSize', removed_size),
+        ]))
+    elif output_format == 'ndjson':
+        return u''.join(
+            json.dumps(OrderedDict(
+                [('Change', change)] + list(record.items()))) + u'\n'
+            for change, records in zip(LayerDiff._fields, diff)
+            for record in records
+        )
+    elif output_format != 'text':
+        raise ValueError("invalid output_format '{0}'".format(output_format))
+
+    lines = []
+    for record in diff.added:
+        lines.append(u'+ {0} Tags: {1} Size: {2}'.format(
+            record['Id'][:12], record['RepoTags'],
+            _convert_size(record['Size'])))
+    for record in diff.removed:
+        lines.append(u'- {0} Tags: {1} Size: {2}'.format(
+            record['Id'][:12], record['RepoTags'],
+            _convert_size(record['Size'])))
+    for record in diff.retagged:
+        lines.append(u'~ {0} Tags: {1} -> {2}'.format(
+            record['Id'][:12], record['OldTags'], record['NewTags']))
+    for record in diff.reparented:
+        lines.append(u'^ {0} Parent: {1} -> {2} Size: {3}{4}'.format(
+            record['Id'][:12],
+            record['OldParentId'][:12] or '-',
+            record['NewParentId'][:12] or '-',
+            '-' if record['SizeDelta'] < 0 else '+',
+            _convert_size(abs(record['SizeDelta']))))
+    lines.append(
+        u'\n{0} added ({1}), {2} removed ({3}), {4} retagged, '
+        u'{5} re-parented'.format(
+            len(diff.added), _convert_size(added_size),
+            len(diff.removed), _convert_size(removed_size),
+            len(diff.retagged), len(diff.reparented)))
+    return u'\n'.join(lines)
+
+
+def _parent_id(layer):
+    """:return: the identifier of the parent or '' for heads"""
+    return layer.parent.identifier if layer.parent else ''
+
+
+def _layer_record(layer):
+    """
+    :return: a flat dict of an added or removed layer with the size it adds
+        to its parent
+    :rtype: dict
+    """
+    return OrderedDict([
+        ('Id', layer.identifier),
+        ('ParentId', _parent_id(layer)),
+        ('RepoTags', layer.tags),
+        ('Size', layer.size - layer.parent.size if layer.parent
+         else layer.size),
+    ])
@@ -5,84 +5,412 @@ Analyse dependencies of docker images.
 """
 
 from __future__ import absolute_import
-from .ImageLayer import ImageLayer
+from collections import namedtuple
+import heapq
 
-import docker
-import copy
+from .api import fetch_all_layers
+from .ImageLayer import ImageLayer, SubtreeSizes
+from .LayerTable import LayerTable
+from .PrefixIndex import PrefixIndex
 
+# result of resolve_images
+Resolution = namedtuple(
+    'Resolution', ('heads', 'missing', 'ambiguous', 'matches'))
+# result of focus_layers
+Focus = namedtuple('Focus', ('heads', 'children'))
 
-def _fetch_all_layers():
-    """:return: a list of all image layers as dict generated by docker api"""
-    docker_cli = docker.Client()
-    return docker_cli.images(all=True)
+try:
+    from sys import intern
+except ImportError:  # python 2
+    pass
 
 
-def analyze_layers(images=None):
+def _intern(string):
     """
-    analyze all layers and compute a tree
-    :param images: list of dicts of images provided by docker api (optional)
+    :return: the interned string so that equal tags share their memory
+    """
+    try:
+        return intern(string)
+    except TypeError:  # unicode on python 2
+        return string
+
+
+def analyze_layers(images=None, with_roots=False):
+    """
+    analyze all layers and compute a tree in a single pass over the images.
+    Children listed before their parent (docker lists the newest images
+    first) are linked as soon as the parent arrives. Layers whose parent is
+    not in the list at all become heads.
+    :param images: iterable of dicts of images provided by docker api
+        (optional), it is consumed only once
+    :param with_roots: cache the head of every layer (see compute_roots)
     :return: dict of images. Key is identifier, value is instance of ImageLayer
     :rtype: dict
     """
 
-    if not images:
-        images = _fetch_all_layers()
+    if images is None:
+        images = fetch_all_layers()
     layers = {}
+    # children of the parents that are not yet listed, by parent identifier
+    pending = {}
 
     for image in images:
         layer = ImageLayer(
             identifier=image['Id'],
-            tags=[tag for tag in image['RepoTags'] if tag != '<none>:<none>'],
+            tags=[
+                _intern(tag) for tag in image['RepoTags']
+                if tag != '<none>:<none>'
+            ],
             size=image['VirtualSize'],
+            hosts=image.get('Hosts'),
         )
         layers[image['Id']] = layer
+        children = pending.pop(image['Id'], None)
+        if children is not None:
+            layer.children = children
+            for child in children:
+                child.parent = layer
 
-    for image in images:
         if image['ParentId'] != '':
-            ImageLayer.join_parent_child(
-                parent=layers[image['ParentId']],
-                child=layers[image['Id']],
-            )
+            parent = layers.get(image['ParentId'])
+            if parent is not None:
+                ImageLayer.join_parent_child(parent=parent, child=layer)
+            else:
+                pending.setdefault(image['ParentId'], []).append(layer)
+
+    # the layers left in pending have a parent that is not in the list
+    # (e.g. a filtered image list) and stay heads
+
+    if with_roots:
+        compute_roots(layers)
 
     return layers
 
 
-def get_heads(layers, for_image=None):
+def analyze_table(images=None):
+    """
+    analyze all layers and compute an array based tree
+    :param images: list of dicts of images provided by docker api
+        (optional, only None fetches them from the daemon)
+    :return: columnar representation of the tree
+    :rtype: LayerTable
+    """
+    if images is None:
+        images = fetch_all_layers()
+    return LayerTable.from_images(images)
+
+
+def compute_roots(layers):
+    """
+    cache the head of its tree in every layer with one traversal per tree,
+    so that ImageLayer.root is O(1). The cached pointers are not updated by
+    ImageLayer.join_parent_child or ImageLayer.remove_from_chain, call this
+    function again after changing the tree.
+    :param layers: dict containing all layers
+    """
+    for head in layers.values():
+        if not head.is_head():
+            continue
+        stack = [head]
+        while stack:
+            layer = stack.pop()
+            layer.root = head
+            stack.extend(layer.children)
+
+
+def compute_subtree_sizes(layers):
+    """
+    compute the disk usage of the subtree of every layer with one pre-order
+    and one post-order pass per tree and cache it in ImageLayer.subtree:
+    unique is the sum of the sizes the layer and its descendants add to
+    their parents, shared the size of its ancestors, reclaimable what
+    removing the subtree would free including the untagged ancestors that
+    lead only to it, and descendants the number of descendants. Like
+    compute_roots, call this function again after changing the tree.
+    :param layers: dict containing all layers
+    """
+    for head in layers.values():
+        if not head.is_head():
+            continue
+        order = []
+        # size of the untagged ancestors leading only to the layer
+        exclusive = {head: 0}
+        stack = [head]
+        while stack:
+            layer = stack.pop()
+            order.append(layer)
+            if not layer.tags and len(layer.children) == 1:
+                chain = exclusive[layer] + _delta(layer)
+            else:
+                chain = 0
+            for child in layer.children:
+                exclusive[child] = chain
+                stack.append(child)
+
+        for layer in reversed(order):
+            unique = _delta(layer)
+            descendants = 0
+            for child in layer.children:
+                unique += child.subtree.unique
+                descendants += child.subtree.descendants + 1
+            layer.subtree = SubtreeSizes(
+                unique=unique,
+                shared=layer.size - _delta(layer),
+                reclaimable=unique + exclusive[layer],
+                descendants=descendants,
+            )
+
+
+def _delta(layer):
+    """
+    :return: the size the layer adds to its parent
+    :rtype: int
+    """
+    if layer.is_head():
+        return layer.size
+    return layer.size - layer.parent.size
+
+
+def top_layers(layers, count, sort='size', heads=None):
+    """
+    select the largest layers that do not contain each other. The candidates
+    are ranked with heapq.nlargest, largest first, and a candidate is skipped
+    if an ancestor or a descendant of it was selected, so that no layer is
+    printed twice. If too many candidates are skipped, twice as many are
+    ranked again.
+    :param layers: dict containing all layers
+    :param count: number of layers to select
+    :param sort: size (the size the layer adds to its parent), children
+        (number of children) or depth (length of the longest chain of
+        descendants)
+    :param heads: only select layers of the trees of these layers (optional)
+    :return: the selected layers, largest first (at most count)
+    :rtype: list
+    :raises ValueError: if sort is invalid
+    """
+    if sort == 'size':
+        key = _delta
+    elif sort == 'children':
+        key = lambda layer: len(layer.children)
+    elif sort == 'depth':
+        key = _subtree_depths(layers).__getitem__
+    else:
+        raise ValueError("invalid sort '{0}'".format(sort))
+
+    if heads is not None:
+        candidates = []
+        seen = set()
+        stack = list(heads)
+        while stack:
+            layer = stack.pop()
+            if layer.identifier in seen:
+                continue
+            seen.add(layer.identifier)
+            candidates.append(layer)
+            stack.extend(layer.children)
+    else:
+        candidates = list(layers.values())
+
+    limit = count
+    while True:
+        # nlargest keeps equal keys in the order of the candidates
+        ranked = heapq.nlargest(limit, candidates, key=key)
+        selected = _select_disjoint(ranked, count)
+        if len(selected) == count or limit >= len(candidates):
+            return selected
+        limit *= 2
+
+
+def _select_disjoint(ranked, count):
+    """
+    :param ranked: candidate layers, largest first
+    :param count: number of layers to select
+    :return: the first count layers of ranked that are neither an ancestor
+        nor a descendant of an earlier selected layer
+    :rtype: list
+    """
+    selected = []
+    # the subtrees and the ancestors of the selected layers, every layer is
+    # added once because the selected subtrees do not overlap
+    blocked = set()
+    for layer in ranked:
+        if len(selected) == count:
+            break
+        if layer.identifier in blocked:
+            continue
+        selected.append(layer)
+        stack = [layer]
+        while stack:
+            cur = stack.pop()
+            blocked.add(cur.identifier)
+            stack.extend(cur.children)
+        parent = layer.parent
+        while parent is not None and parent.identifier not in blocked:
+            blocked.add(parent.identifier)
+            parent = parent.parent
+    return selected
+
+
+def _subtree_depths(layers):
+    """
+    :param layers: dict containing all layers
+    :return: length of the longest chain of descendants of every layer
+    :rtype: dict
+    """
+    order = []
+    stack = [layer for layer in layers.values() if layer.is_head()]
+    while stack:
+        layer = stack.pop()
+        order.append(layer)
+        stack.extend(layer.children)
+    depths = {}
+    for layer in reversed(order):
+        depths[layer] = max(
+            [depths[child] + 1 for child in layer.children] or [0])
+    return depths
+
+
+def build_index(layers):
+    """
+    build a prefix index over the identifiers and tags of all layers
+    :param layers: dict containing all layers
+    :return: index to be passed to find_layers or get_heads
+    :rtype: PrefixIndex
+    """
+    pairs = []
+    for layer_id, layer in layers.items():
+        pairs.append((layer_id, layer_id))
+        pairs.extend((tag, layer_id) for tag in layer.tags)
+    return PrefixIndex(pairs)
+
+
+def find_layers(layers, for_image, index=None):
+    """
+    return all layers whose identifier or one of its tags starts with for_image
+    :param layers: double linked list of layers
+    :param for_image: (abbreviated) image id or [repository]:[tag]
+    :param index: prefix index built by build_index (optional)
+    :return: the matching layers
+    :rtype: list
+    """
+    if index is not None:
+        return [
+            layers[layer_id] for layer_id in index.find(for_image)
+            if layer_id in layers
+        ]
+    return [
+        layer for layer_id, layer in layers.items()
+        if layer_id.startswith(for_image) or
+        [t for t in layer.tags if t.startswith(for_image)]
+    ]
+
+
+def get_heads(layers, for_image=None, index=None):
     """
     return the head(s) of the specified image or all heads of a given tree
     :param layers: double linked list of layers
     :param for_image: image to get heads for
+    :param index: prefix index built by build_index (optional)
     :return: heads of the specified image or all heads of a given tree
     :rtype: list
     """
     if not for_image:
         return [layer for layer in layers.values() if layer.is_head()]
 
+    return [layer.root for layer in find_layers(layers, for_image, index)]
+
+
+def resolve_images(layers, for_images, index=None):
+    """
+    resolve many images at once. The layers are traversed once to build the
+    prefix index (unless it is given), then every image is a lookup.
+    :param layers: dict containing all layers
+    :param for_images: iterable of (abbreviated) image ids or
+        [repository]:[tag]
+    :param index: prefix index built by build_index (optional)
+    :return: the heads of all images without duplicates in the order of the
+        images, the images without a match, (image, matching layers)
+        tuples for the images matching more than one layer and all matching
+        layers without duplicates
+    :rtype: Resolution
+    """
+    if index is None:
+        index = build_index(layers)
     heads = []
+    seen = set()
+    missing = []
+    ambiguous = []
+    all_matches = []
+    matched = set()
+    for image in for_images:
+        matches = find_layers(layers, image, index)
+        if not matches:
+            missing.append(image)
+        elif len(matches) > 1:
+            ambiguous.append((image, matches))
+        for layer in matches:
+            if layer.identifier not in matched:
+                matched.add(layer.identifier)
+                all_matches.append(layer)
+            head = layer.root
+            if head.identifier not in seen:
+                seen.add(head.identifier)
+                heads.append(head)
+    return Resolution(heads, missing, ambiguous, all_matches)
 
-    for layer_id, layer in layers.items():
-        if not layer_id.startswith(for_image) and \
-                not [t for t in layer.tags if t.startswith(for_image)]:
-            continue
 
-        next_parent = layer.parent
-        if next_parent is None:
-            heads.append(layer)
+def focus_layers(matches, descendants=False):
+    """
+    select the paths from the heads to the matched layers. Every matched layer
+    and its ancestors are visited once, so the time depends on the number of
+    selected layers and not on the size of the trees.
+    :param matches: the matched layers, e.g. Resolution.matches
+    :param descendants: also select all layers built on the matched layers
+    :return: the heads of the paths and a dict mapping the identifier of
+        every selected layer to its selected children (for the children
+        argument of printer.print_tree). The children of matched layers are
+        missing with descendants, so that all of them are printed.
+    :rtype: Focus
+    """
+    # children on the paths in the order the paths were found
+    path_children = {}
+    heads = []
+    for layer in matches:
+        if layer.identifier in path_children:
             continue
-        while not next_parent.is_head():
-            next_parent = next_parent.parent
-        heads.append(next_parent)
+        path_children[layer.identifier] = []
+        while layer.parent is not None:
+            parent = layer.parent
+            if parent.identifier in path_children:
+                path_children[parent.identifier].append(layer)
+                break
+            path_children[parent.identifier] = [layer]
+            layer = parent
+        else:
+            heads.append(layer)
 
-    return heads
+    # walk the paths down to leave out the paths below matched layers
+    matched = set(layer.identifier for layer in matches)
+    children = {}
+    stack = list(heads)
+    while stack:
+        layer = stack.pop()
+        if descendants and layer.identifier in matched:
+            continue
+        children[layer.identifier] = path_children[layer.identifier]
+        stack.extend(children[layer.identifier])
+    return Focus(heads, children)
 
 
 def remove_untagged_layers(layers):
     """
-    deepcopy the layers dict and remove all untagged layers from the tree
+    deepcopy the layers dict and remove all untagged layers from the tree.
+    The head of every remaining layer is cached (see compute_roots).
     :param layers: dict containing all layers
     :return: tree without untagged layers
     :rtype: dict
     """
+    import copy
     layers_cpy = copy.deepcopy(layers)
     layer_ids_to_remove = []
     for layer_id, layer in layers_cpy.items():
@@ -92,4 +420,40 @@ def remove_untagged_layers(layers):
 
     for layer_id in layer_ids_to_remove:
         layers_cpy.pop(layer_id)
+    compute_roots(layers_cpy)
     return layers_cpy
+
+
+def prune_untagged_layers(layers):
+    """
+    build a tree of new layers containing only the tagged layers in one pass
+    without copying the untagged ones. Every tagged layer is linked to its
+    nearest tagged ancestor and the head of every new layer is cached
+    (see compute_roots). Subtree sizes computed on the given layers are
+    kept, they include the untagged layers. The given layers are not
+    modified.
+    :param layers: dict containing all layers
+    :return: tree without untagged layers
+    :rtype: dict
+    """
+    pruned = {}
+    stack = [(head, None) for head in reversed(get_heads(layers))]
+    while stack:
+        layer, parent = stack.pop()
+        if layer.tags:
+            node = ImageLayer(
+                identifier=layer.identifier,
+                tags=list(layer.tags),
+                size=layer.size,
+                hosts=layer.hosts,
+            )
+            node.subtree = layer.subtree
+            if parent is None:
+                node.root = node
+            else:
+                ImageLayer.join_parent_child(parent=parent, child=node)
+                node.root = parent.root
+            pruned[layer.identifier] = node
+            parent = node
+        stack.extend((child, parent) for child in reversed(layer.children))
+    return pruned
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keep a tree of layers up to date with the events of the docker api.
+"""
+
+from __future__ import absolute_import
+from . import api
+from .ImageLayer import ImageLayer
+
+# event states of the docker api that add an image or change its tags
+UPDATE_EVENTS = ('pull', 'tag', 'untag', 'import', 'load')
+# event states of the docker api that remove an image
+DELETE_EVENTS = ('delete',)
+
+
+def apply_event(layers, event, inspect_image, index=None):
+    """
+    apply an image event of the docker api to the tree in place
+    :param layers: dict containing all layers
+    :param event: decoded event as provided by docker api
+    :param inspect_image: function returning the image dict (as provided by
+        docker api) for an id or name, or None if there is no such image
+    :param index: prefix index built by build_index to update (optional)
+    :return: True if the tree has changed
+    :rtype: bool
+    """
+    if event.get('Type', 'image') != 'image':
+        return False
+    status = event.get('Action') or event.get('status')
+    if status in DELETE_EVENTS:
+        return _remove_layer(layers, event['id'], index)
+    if status not in UPDATE_EVENTS:
+        return False
+    # for pull events the id is the name of the image
+    image = inspect_image(event['id'])
+    if image is None:
+        return False
+    changed = False
+    layer = layers.get(image['Id'])
+    if layer is None:
+        layer = _insert_layers(layers, image, inspect_image, index)
+        changed = True
+    tags = _image_tags(image)
+    if tags != layer.tags:
+        _set_tags(layers, layer, tags, index)
+        changed = True
+    return changed
+
+
+def follow_events(layers, events, inspect_image, index=None):
+    """
+    apply a stream of events to the tree
+    :param layers: dict containing all layers
+    :param events: iterable of decoded events as provided by docker api
+    :param inspect_image: see apply_event
+    :param index: prefix index built by build_index to update (optional)
+    :return: generator of the events that have changed the tree
+    """
+    for event in events:
+        if apply_event(layers, event, inspect_image, index):
+            yield event
+
+
+def watch(layers, docker_cli=None, index=None):
+    """
+    apply the events of a docker daemon to the tree as they occur
+    :param layers: dict containing all layers
+    :param docker_cli: docker client to use (default: api.get_client())
+    :param index: prefix index built by build_index to update (optional)
+    :return: generator of the events that have changed the tree
+    """
+    import docker
+    docker_cli = docker_cli or api.get_client()
+
+    def inspect_image(image_id):
+        """:return: the image dict or None if it does not exist anymore"""
+        try:
+            return docker_cli.inspect_image(image_id)
+        except docker.errors.NotFound:
+            return None
+
+    return follow_events(
+        layers, docker_cli.events(decode=True), inspect_image, index)
+
+
+def _insert_layers(layers, image, inspect_image, index):
+    """
+    insert the image and all of its ancestors that are missing in the tree
+    :return: the layer of image
+    :rtype: ImageLayer
+    """
+    missing = []
+    while image is not None and image['Id'] not in layers:
+        missing.append(image)
+        parent_id = _image_parent(image)
+        image = inspect_image(parent_id) if parent_id else None
+    for image in reversed(missing):
+        layer = ImageLayer(
+            identifier=image['Id'],
+            tags=[],
+            size=image.get('VirtualSize', image.get('Size', 0)),
+        )
+        parent = layers.get(_image_parent(image))
+        if parent is not None:
+            _drop_sizes(parent)
+            ImageLayer.join_parent_child(parent=parent, child=layer)
+            layer.root = parent.root
+        else:
+            layer.root = layer
+        layers[layer.identifier] = layer
+        if index is not None:
+            index.add(layer.identifier, layer.identifier)
+        _set_tags(layers, layer, _image_tags(image), index)
+    return layers[missing[0]['Id']]
+
+
+def _remove_layer(layers, layer_id, index):
+    """
+    splice the layer out of the tree
+    :return: True if the layer was in the tree
+    :rtype: bool
+    """
+    layer = layers.pop(layer_id, None)
+    if layer is None:
+        return False
+    if index is not None:
+        index.remove(layer_id, layer_id)
+        for tag in layer.tags:
+            index.remove(tag, layer_id)
+    _drop_sizes(layer)
+    was_head = layer.is_head()
+    children = list(layer.children)
+    layer.remove_from_chain()
+    if was_head:
+        # the children are heads of their own trees now
+        for child in children:
+            stack = [child]
+            while stack:
+                cur = stack.pop()
+                cur.root = child
+                stack.extend(cur.children)
+    return True
+
+
+def _set_tags(layers, layer, tags, index):
+    """
+    set the tags of a layer and remove them from the layer they were moved from
+    """
+    for tag in tags:
+        if tag in layer.tags:
+            continue
+        if index is not None:
+            owners = [
+                layers[layer_id] for layer_id in index.find(tag)
+                if layer_id in layers
+            ]
+        else:
+            owners = layers.values()
+        for owner in owners:
+            if owner is not layer and tag in owner.tags:
+                _drop_sizes(owner)
+                owner.tags = [t for t in owner.tags if t != tag]
+                if index is not None:
+                    index.remove(tag, owner.identifier)
+    if index is not None:
+        for tag in layer.tags:
+            index.remove(tag, layer.identifier)
+        for tag in tags:
+            index.add(tag, layer.identifier)
+    if tags != layer.tags:
+        # the reclaimable sizes depend on which layers are tagged
+        _drop_sizes(layer)
+    layer.tags = tags
+
+
+def _drop_sizes(layer):
+    """
+    drop the subtree sizes cached on the tree of the layer, they are
+    computed again when they are needed (see compute_subtree_sizes)
+    """
+    root = layer.root
+    if root.subtree is None:
+        # the sizes of a tree are computed and dropped together
+        return
+    stack = [root]
+    while stack:
+        cur = stack.pop()
+        cur.subtree = None
+        stack.extend(cur.children)
+
+
+def _image_parent(image):
+    """:return: the parent id of an image from docker images or inspect"""
+    return image.get('ParentId', image.get('Parent')) or ''
+
+
+def _image_tags(image):
+    """:return: the tags of an image without <none>:<none>"""
+    return [
+        tag for tag in image.get('RepoTags') or []
+        if tag != '<none>:<none>'
+    ]
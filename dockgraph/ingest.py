@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+Read image lists of the docker api from files, e.g. collected with
+``curl --unix-socket /var/run/docker.sock http:/images/json?all=1``.
+"""
+
+from __future__ import absolute_import
+import io
+import json
+import re
+import sys
+
+# characters read from the stream at once
+CHUNK_SIZE = 65536
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_images(stream, chunk_size=CHUNK_SIZE):
+    """
+    decode the images of a json array or of json lines (one image per line)
+    incrementally, only the image being decoded is held in memory
+    :param stream: text stream to read from
+    :param chunk_size: characters read from the stream at once
+    :return: generator of dicts of images provided by docker api
+    :rtype: generator
+    :raises ValueError: if the stream is not valid json
+    """
+    decoder = json.JSONDecoder()
+    buf = u''
+    pos = 0
+    eof = False
+    in_array = None  # unknown until the first character
+    # in an array: an image was decoded and has to be followed by , or ]
+    need_separator = False
+    after_comma = False
+    count = 0
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                if in_array:
+                    raise ValueError('unterminated json array')
+                break
+            buf, pos, eof = _read_more(stream, buf, pos, chunk_size)
+            continue
+
+        if in_array is None:
+            in_array = buf[pos] == '['
+            if in_array:
+                pos += 1
+                continue
+        elif in_array and buf[pos] == ']':
+            if after_comma:
+                raise ValueError('expected an image after , in json array')
+            break
+        elif in_array and need_separator:
+            if buf[pos] != ',':
+                raise ValueError(
+                    'expected , or ] after image {0}'.format(count))
+            pos += 1
+            need_separator = False
+            after_comma = True
+            continue
+
+        try:
+            image, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            # the image continues in the next chunk
+            if eof:
+                raise
+            buf, pos, eof = _read_more(stream, buf, pos, chunk_size)
+            continue
+        if not isinstance(image, dict):
+            raise ValueError(
+                'image {0} is no json object'.format(count + 1))
+        pos = end
+        count += 1
+        need_separator = in_array
+        after_comma = False
+        yield image
+
+
+def read_images(path):
+    """
+    read the images from a file
+    :param path: path of a file with a json array or json lines, '-' for
+        stdin
+    :return: generator of dicts of images provided by docker api
+    :rtype: generator
+    :raises ValueError: if the file is not valid json
+    """
+    if path == '-':
+        for image in iter_images(sys.stdin):
+            yield image
+        return
+    with io.open(path, encoding='utf-8') as image_file:
+        for image in iter_images(image_file):
+            yield image
+
+
+def _read_more(stream, buf, pos, chunk_size):
+    """
+    drop the consumed part of the buffer and append the next chunk
+    :return: the new buffer, the new position and True if the stream ended
+    :rtype: tuple
+    """
+    chunk = stream.read(chunk_size)
+    return buf[pos:] + chunk, 0, not chunk
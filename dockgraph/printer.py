@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+"""
+Render trees of Docker layers as text, json or ndjson.
+"""
+
+from __future__ import absolute_import
+from .ImageLayer import ImageLayer, _convert_size
+
+import sys
+import json
+from collections import OrderedDict
+
+
+# number of chunks collected before they are written to the stream
+WRITE_BUFFER_SIZE = 512
+
+
+def print_tree(heads, output_format='text', encoding='ascii', sizes=False,
+               children=None, max_depth=None, max_children=None):
+    """
+    render a tree starting at heads
+    :param heads: heads of the tree
+    :param output_format: format of the printed tree (text, json or ndjson)
+    :param encoding: the terminal encoding (ascii or utf-8)
+    :param sizes: print the subtree sizes of every layer, they are computed
+        if they are not cached yet (see dockgraph.compute_subtree_sizes)
+    :param children: dict mapping layer identifiers to the children printed
+        instead of all children of the layer (optional, see
+        dockgraph.focus_layers)
+    :param max_depth: print no layers below this depth, the heads have depth
+        0 (optional)
+    :param max_children: print at most this number of children of a layer
+        (optional). The number and size of the children left out by both
+        limits are summarized from the subtree sizes without visiting them.
+    :return: the rendered tree
+    :rtype: str
+    """
+    return u''.join(_iter_tree(
+        heads, output_format, encoding, sizes,
+        _selector(children, max_depth, max_children)))
+
+
+def write_tree(heads, stream=None, output_format='text', encoding='ascii',
+               sizes=False, children=None, max_depth=None, max_children=None):
+    """
+    write a tree starting at heads to a stream while it is rendered
+    :param heads: heads of the tree
+    :param stream: file-like object to write to (default: stdout)
+    :param output_format: format of the printed tree (text, json or ndjson)
+    :param encoding: the terminal encoding (ascii or utf-8)
+    :param sizes: print the subtree sizes of every layer (see print_tree)
+    :param children: the printed children of layers (see print_tree)
+    :param max_depth: print no layers below this depth (see print_tree)
+    :param max_children: print at most this number of children of a layer
+        (see print_tree)
+    """
+    stream = stream if stream is not None else sys.stdout
+    buf = []
+    for chunk in _iter_tree(
+            heads, output_format, encoding, sizes,
+            _selector(children, max_depth, max_children)):
+        buf.append(chunk)
+        if len(buf) >= WRITE_BUFFER_SIZE:
+            stream.write(u''.join(buf))
+            buf = []
+    stream.write(u''.join(buf))
+
+
+def _iter_tree(heads, output_format, encoding, sizes=False, select=None):
+    """
+    render a tree starting at heads chunk by chunk
+    :param heads: heads of the tree
+    :param output_format: format of the printed tree (text, json or ndjson)
+    :param encoding: the terminal encoding (ascii or utf-8)
+    :param sizes: print the subtree sizes of every layer
+    :param select: function selecting the printed children (see _selector)
+    :return: generator of strings
+    """
+    select = select if select is not None else _selector()
+    if sizes or select.limited:
+        _compute_missing_sizes(heads)
+    encoding = encoding.upper()
+    if output_format == 'text':
+        chars = {
+            'headstr': u'───' if encoding == 'UTF-8' else '--',
+            'chldstr': u'├──' if encoding == 'UTF-8' else '|-',
+            'laststr': u'└──' if encoding == 'UTF-8' else '`-',
+            'indtstr': u'│   ' if encoding == 'UTF-8' else '|  ',
+            'lastindtstr': '    ' if encoding == 'UTF-8' else '   ',
+            'ellipsis': u'…' if encoding == 'UTF-8' else '...',
+        }
+        count = 0
+        for line, layer in _iter_text_lines(heads, chars, sizes, select):
+            if layer is not None:
+                count += 1
+            yield line + u'\n'
+        yield u"\n{0} heads, {1} layers".format(len(heads), count)
+    elif output_format == 'json':
+        for chunk in _iter_json_chunks(heads, sizes, select):
+            yield chunk
+    elif output_format == 'ndjson':
+        for layer, shown, elided in _iter_layers(heads, select):
+            yield json.dumps(
+                _layer_record(layer, sizes, shown, elided)) + u'\n'
+    else:
+        raise ValueError("invalid output_format '{0}'".format(output_format))
+
+
+def _compute_missing_sizes(heads):
+    """
+    compute the subtree sizes of the trees of heads if a layer of a tree has
+    none cached, e.g. because it was added by an event
+    """
+    from .dockgraph import compute_subtree_sizes
+    roots = dict((head.root.identifier, head.root) for head in heads)
+    missing = dict(
+        (identifier, root) for identifier, root in roots.items()
+        if _lacks_sizes(root)
+    )
+    compute_subtree_sizes(missing)
+
+
+def _lacks_sizes(root):
+    """
+    :return: True if a layer of the tree of root has no subtree sizes
+    :rtype: bool
+    """
+    stack = [root]
+    while stack:
+        layer = stack.pop()
+        if layer.subtree is None:
+            return True
+        stack.extend(layer.children)
+    return False
+
+
+def _selector(children=None, max_depth=None, max_children=None):
+    """
+    :param children: the printed children of layers (see print_tree)
+    :param max_depth: print no layers below this depth (see print_tree)
+    :param max_children: print at most this number of children of a layer
+    :return: function mapping a layer and its depth to the list of printed
+        children and the list of children left out, its attribute limited
+        is True if children may be left out
+    :rtype: function
+    """
+    limited = max_depth is not None or max_children is not None
+
+    def select(layer, depth):
+        """:return: the printed and the left out children of layer"""
+        if children is None:
+            layer_children = layer.children
+        else:
+            layer_children = children.get(layer.identifier, layer.children)
+        if not limited:
+            return layer_children, ()
+        if max_depth is not None and depth >= max_depth:
+            return (), layer_children
+        if max_children is not None and len(layer_children) > max_children:
+            return (layer_children[:max_children],
+                    layer_children[max_children:])
+        return layer_children, ()
+
+    select.limited = limited
+    return select
+
+
+def _elided_size(layer, shown, elided):
+    """
+    :param shown: children of layer that are printed
+    :param elided: children of layer that are not printed
+    :return: the size below layer that is not part of the subtrees of the
+        printed children, taken from the subtree sizes. If all children of
+        the layer were selected, this includes the pruned untagged layers
+        between layer and its children.
+    :rtype: int
+    """
+    if len(shown) + len(elided) == len(layer.children):
+        # the subtree sizes belong to the tree before pruning, shared is the
+        # size of the parent there
+        below = layer.subtree.unique - layer.size + layer.subtree.shared
+        return below - sum(child.subtree.unique for child in shown)
+    return sum(child.subtree.unique for child in elided)
+
+
+def _iter_json_chunks(heads, sizes=False, select=None):
+    """
+    encode the trees starting at heads like json.dumps([dict(head), ...])
+    without building the nested dicts, using an explicit stack
+    :param heads: heads of the tree
+    :param sizes: add the subtree sizes of every layer
+    :param select: function selecting the printed children (see _selector)
+    :return: generator of strings
+    """
+    select = select if select is not None else _selector()
+    stack = [u']']
+    _push_json_list(stack, heads, 0)
+    yield u'['
+    while stack:
+        item = stack.pop()
+        if not isinstance(item, tuple):
+            yield item
+            continue
+        layer, depth = item
+        yield u'{{"Id": {0}, "ParentId": {1}, "RepoTags": {2}, ' \
+            u'"VirtualSize": {3}, '.format(
+                json.dumps(layer.identifier),
+                json.dumps(layer.parent.identifier if layer.parent else ''),
+                json.dumps(layer.tags),
+                json.dumps(layer.size),
+            )
+        if layer.hosts is not None:
+            yield u'"Hosts": {0}, '.format(json.dumps(layer.hosts))
+        if sizes:
+            yield u'"UniqueSize": {0}, "SharedSize": {1}, ' \
+                u'"ReclaimableSize": {2}, "Descendants": {3}, '.format(
+                    *layer.subtree)
+        shown, elided = select(layer, depth)
+        if elided:
+            yield u'"ElidedChildren": {0}, "ElidedSize": {1}, '.format(
+                len(elided), _elided_size(layer, shown, elided))
+        yield u'"Children": ['
+        stack.append(u']}')
+        _push_json_list(stack, shown, depth + 1)
+
+
+def _push_json_list(stack, layers, depth):
+    """
+    push layers separated by commas onto the stack of _iter_json_chunks
+    :param stack: the stack to push onto
+    :param layers: the layers in the order they have to be encoded
+    :param depth: the depth of the layers
+    """
+    for pos in range(len(layers) - 1, -1, -1):
+        stack.append((layers[pos], depth))
+        if pos:
+            stack.append(u', ')
+
+
+def _iter_layers(heads, select=None):
+    """
+    iterate over all printed layers of the trees starting at heads in
+    pre-order
+    :param heads: heads of the tree
+    :param select: function selecting the printed children (see _selector)
+    :return: generator of the layers, their printed children and their
+        children left out
+    :rtype: generator
+    """
+    select = select if select is not None else _selector()
+    stack = [(head, 0) for head in reversed(heads)]
+    while stack:
+        layer, depth = stack.pop()
+        shown, elided = select(layer, depth)
+        yield layer, shown, elided
+        stack.extend((child, depth + 1) for child in reversed(shown))
+
+
+def _layer_record(layer, sizes=False, shown=(), elided=()):
+    """
+    :param sizes: add the subtree sizes of the layer
+    :param shown: children of the layer that are printed
+    :param elided: children of the layer that are not printed
+    :return: a flat dict of a layer (without children) for ndjson
+    :rtype: dict
+    """
+    record = OrderedDict([
+        ('Id', layer.identifier),
+        ('ParentId', layer.parent.identifier if layer.parent else ''),
+        ('RepoTags', layer.tags),
+        ('VirtualSize', layer.size),
+    ])
+    if layer.hosts is not None:
+        record['Hosts'] = layer.hosts
+    if sizes:
+        record['UniqueSize'] = layer.subtree.unique
+        record['SharedSize'] = layer.subtree.shared
+        record['ReclaimableSize'] = layer.subtree.reclaimable
+        record['Descendants'] = layer.subtree.descendants
+    if elided:
+        record['ElidedChildren'] = len(elided)
+        record['ElidedSize'] = _elided_size(layer, shown, elided)
+    return record
+
+
+def _layer_text(layer, sizes):
+    """
+    :param sizes: add the subtree sizes of the layer
+    :return: the description of a layer in a text line
+    :rtype: str
+    """
+    if not sizes:
+        return str(layer)
+    return u'{0} Unique: {1} Shared: {2} Reclaimable: {3} ' \
+        u'Descendants: {4}'.format(
+            str(layer),
+            _convert_size(layer.subtree.unique),
+            _convert_size(layer.subtree.shared),
+            _convert_size(layer.subtree.reclaimable),
+            layer.subtree.descendants,
+        )
+
+
+def _elided_text(layer, shown, elided, ellipsis):
+    """
+    :param shown: children of layer that are printed
+    :param elided: children of layer that are not printed
+    :param ellipsis: the character(s) starting the summary
+    :return: the summary of the children left out in a text line
+    :rtype: str
+    """
+    return u'{0} {1} more {2}, {3}'.format(
+        ellipsis, len(elided), 'child' if len(elided) == 1 else 'children',
+        _convert_size(_elided_size(layer, shown, elided)))
+
+
+def _iter_text_lines(heads, chars, sizes=False, select=None):
+    """
+    render the text lines of a tree with an explicit stack
+    :param heads: layers to start at, each is printed as a head
+    :param chars: characters that are used for formatting the lines
+    :param sizes: add the subtree sizes of every layer
+    :param select: function selecting the printed children (see _selector)
+    :return: generator of lines without line break and the printed layer,
+        None for the summaries of children left out
+    """
+    select = select if select is not None else _selector()
+    # (layer or summary, indentation of the layer, is last child or None for
+    # heads, depth of the layer)
+    stack = [(head, u'', None, 0) for head in reversed(heads)]
+    while stack:
+        layer, indentation, is_last, depth = stack.pop()
+        if not isinstance(layer, ImageLayer):
+            yield u'{ind}{laststr} {summary}'.format(
+                ind=indentation, laststr=chars['laststr'],
+                summary=layer), None
+            continue
+        if is_last is None:
+            yield u'{headstr} {lay}'.format(
+                headstr=chars['headstr'],
+                lay=_layer_text(layer, sizes)), layer
+            is_last = True
+        else:
+            chldstr = chars['laststr'] if is_last else chars['chldstr']
+            yield u'{ind}{chldstr} {lay}'.format(
+                ind=indentation, chldstr=chldstr,
+                lay=_layer_text(layer, sizes)), layer
+        indentation += chars['lastindtstr'] if is_last else chars['indtstr']
+        shown, elided = select(layer, depth)
+        if elided:
+            stack.append((
+                _elided_text(layer, shown, elided, chars['ellipsis']),
+                indentation, True, depth + 1))
+        for pos in range(len(shown) - 1, -1, -1):
+            stack.append((
+                shown[pos], indentation,
+                pos == len(shown) - 1 and not elided, depth + 1))
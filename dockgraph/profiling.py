@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lightweight timing of the phases of a dockgraph run.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class Profiler(object):
+    """
+    collects the duration of named phases and counters
+    """
+
+    enabled = True
+
+    def __init__(self, cprofile_path=None):
+        """
+        create a new Profiler
+        :param cprofile_path: also run cProfile and dump its stats to this
+            path in stop() (optional)
+        """
+        self.phases = []
+        self.counters = []
+        self._cprofile = None
+        self._cprofile_path = cprofile_path
+        if cprofile_path:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    @contextmanager
+    def span(self, name):
+        """
+        measure the duration of a phase
+        :param name: name of the phase
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.time() - start))
+
+    def count(self, name, value):
+        """
+        add to a counter
+        :param name: name of the counter
+        :param value: value to add
+        """
+        for pos, (counter, total) in enumerate(self.counters):
+            if counter == name:
+                self.counters[pos] = (counter, total + value)
+                return
+        self.counters.append((name, value))
+
+    def stop(self):
+        """stop cProfile and dump its stats"""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self._cprofile_path)
+            self._cprofile = None
+
+    def report(self):
+        """
+        :return: a printable breakdown of the phases and the counters
+        :rtype: str
+        """
+        total = sum(seconds for _, seconds in self.phases)
+        lines = ['{0:<12} {1:>10} {2:>6}'.format('phase', 'ms', '%')]
+        for name, seconds in self.phases:
+            lines.append('{0:<12} {1:>10.1f} {2:>5.0%}'.format(
+                name, seconds * 1000, seconds / total if total else 0))
+        lines.append('{0:<12} {1:>10.1f}'.format('total', total * 1000))
+        for name, value in self.counters:
+            lines.append('{0:<12} {1:>10}'.format(name, value))
+        return '\n'.join(lines)
+
+
+class NullProfiler(object):
+    """
+    profiler that does nothing, used when profiling is disabled
+    """
+
+    enabled = False
+
+    @contextmanager
+    def span(self, name):
+        """do nothing"""
+        yield
+
+    def count(self, name, value):
+        """do nothing"""
+        pass
+
+    def stop(self):
+        """do nothing"""
+        pass
+
+
+class CountingWriter(object):
+    """
+    file-like object counting the bytes written to a stream
+    """
+
+    def __init__(self, stream, encoding='utf-8'):
+        """
+        :param stream: the stream to write to
+        :param encoding: encoding used to count the bytes
+        """
+        self.stream = stream
+        self.encoding = encoding
+        self.written = 0
+
+    def write(self, data):
+        """write data to the stream and count its bytes"""
+        self.written += len(data.encode(self.encoding))
+        self.stream.write(data)
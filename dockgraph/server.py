@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keep the analyzed layers in memory and answer queries over a unix socket.
+
+A query is one line of json with the keys images (list of image specs, empty
+for all images), intermediate (bool), format, encoding, sizes (bool), focus
+(bool), descendants (bool), max_depth and max_children (int or null). The
+answer is one line of json with either an error or a list of notes, followed
+by the rendered tree.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import codecs
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:  # python 2
+    import SocketServer as socketserver
+
+from . import api
+from . import dockgraph
+from .printer import write_tree
+
+# seconds between two refreshes of the layers
+DEFAULT_REFRESH_INTERVAL = 30
+# seconds a client waits for the server to answer
+QUERY_TIMEOUT = 10
+
+
+def default_socket_path():
+    """
+    :return: path of the socket in $XDG_RUNTIME_DIR or in a directory of the
+        user in the temp directory, which the server creates only accessible
+        by the user
+    :rtype: str
+    """
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        return os.path.join(
+            os.environ['XDG_RUNTIME_DIR'],
+            'dockgraph-{0}.sock'.format(os.getuid()))
+    return os.path.join(
+        tempfile.gettempdir(), 'dockgraph-{0}'.format(os.getuid()),
+        'dockgraph.sock')
+
+
+class GraphServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    unix socket server holding the analyzed layers
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, fetch=None,
+                 refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        """
+        analyze the layers and bind the socket
+        :param socket_path: path of the unix socket
+        :param fetch: function returning the image list of the docker api
+            (default: api.fetch_all_layers)
+        :param refresh_interval: seconds between two refreshes of the layers
+        """
+        self.fetch = fetch or api.fetch_all_layers
+        self.refresh_interval = refresh_interval
+        self.graphs = None
+        self.refresh()
+        directory = os.path.dirname(os.path.abspath(socket_path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        _remove_stale_socket(socket_path)
+        socketserver.UnixStreamServer.__init__(
+            self, socket_path, QueryHandler)
+
+    def refresh(self):
+        """analyze the layers again and replace the ones being served"""
+        layers = dockgraph.analyze_layers(self.fetch(), with_roots=True)
+        dockgraph.compute_subtree_sizes(layers)
+        tagged = dockgraph.prune_untagged_layers(layers)
+        # replaced at once, running queries keep the graphs they started with
+        self.graphs = {
+            True: (layers, dockgraph.build_index(layers)),
+            False: (tagged, dockgraph.build_index(tagged)),
+        }
+
+    def serve_forever(self, poll_interval=0.5):
+        """refresh the layers in the background and handle queries"""
+        refresher = threading.Thread(target=self._refresh_loop)
+        refresher.daemon = True
+        refresher.start()
+        try:
+            socketserver.UnixStreamServer.serve_forever(self, poll_interval)
+        finally:
+            os.unlink(self.server_address)
+
+    def _refresh_loop(self):
+        """refresh the layers every refresh_interval seconds"""
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as err:  # keep serving the old layers
+                print('refresh failed: {0}'.format(err), file=sys.stderr)
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """
+    answer a single query of a client
+    """
+
+    def handle(self):
+        """
+        answer the query, an error is written as the header if the answer
+        has not started yet
+        """
+        self._header_written = False
+        try:
+            self._answer()
+        except Exception as err:
+            if not self._header_written:
+                self._write_header({'error': 'query failed: {0}'.format(err)})
+            print('query failed: {0}'.format(err), file=sys.stderr)
+
+    def _answer(self):
+        """read the query, resolve the heads and write the rendered tree"""
+        query = json.loads(self.rfile.readline().decode('utf-8'))
+        layers, index = self.server.graphs[bool(query.get('intermediate'))]
+        notes = []
+        children = None
+        if not query.get('images'):
+            heads = dockgraph.get_heads(layers)
+        else:
+            resolution = dockgraph.resolve_images(
+                layers, query['images'], index)
+            if resolution.missing:
+                self._write_header({
+                    'error': '\n'.join(
+                        'No image found with id/name {0}.'.format(image)
+                        for image in resolution.missing)
+                })
+                return
+            for image, matches in resolution.ambiguous:
+                notes.append(
+                    '{0} is ambiguous, it matches {1} layers: {2}'.format(
+                        image, len(matches),
+                        ', '.join(layer.identifier[:12] for layer in matches)
+                    )
+                )
+            heads = resolution.heads
+            if query.get('focus'):
+                heads, children = dockgraph.focus_layers(
+                    resolution.matches, bool(query.get('descendants')))
+        if query.get('format', 'text') not in ('text', 'json', 'ndjson'):
+            raise ValueError(
+                "invalid output_format '{0}'".format(query['format']))
+        self._write_header({'notes': notes})
+        write_tree(
+            heads,
+            codecs.getwriter('utf-8')(self.wfile),
+            output_format=query.get('format', 'text'),
+            encoding=query.get('encoding', 'ascii'),
+            sizes=bool(query.get('sizes')),
+            children=children,
+            max_depth=query.get('max_depth'),
+            max_children=query.get('max_children'),
+        )
+
+    def _write_header(self, header):
+        """write the json header line of the answer"""
+        self._header_written = True
+        self.wfile.write((json.dumps(header) + '\n').encode('utf-8'))
+
+
+def serve(socket_path=None, fetch=None,
+          refresh_interval=DEFAULT_REFRESH_INTERVAL):
+    """
+    run the server until it is interrupted
+    :param socket_path: path of the unix socket (default: default_socket_path)
+    :param fetch: see GraphServer
+    :param refresh_interval: seconds between two refreshes of the layers
+    """
+    server = GraphServer(
+        socket_path or default_socket_path(), fetch, refresh_interval)
+    server.serve_forever()
+
+
+def query(images, intermediate=False, output_format='text',
+          encoding='ascii', stream=None, socket_path=None, sizes=False,
+          focus=False, descendants=False, max_depth=None,
+          max_children=None, timeout=QUERY_TIMEOUT):
+    """
+    ask a running server for a tree and write it to stream
+    :param images: list of image specs, empty for all images
+    :param intermediate: include intermediate (untagged) layers
+    :param output_format: format of the printed tree (text, json or ndjson)
+    :param encoding: the terminal encoding (ascii or utf-8)
+    :param stream: file-like object to write to (default: stdout)
+    :param socket_path: path of the unix socket (default: default_socket_path)
+    :param sizes: print the subtree sizes of every layer
+    :param focus: only print the paths from the heads to the images
+    :param descendants: with focus, also print the layers built on the images
+    :param max_depth: print no layers below this depth (see print_tree)
+    :param max_children: print at most this number of children of a layer
+    :param timeout: seconds to wait for every part of the answer
+    :return: the header of the answer with either error or notes
+    :rtype: dict
+    :raises socket.error: if no server is running, the socket belongs to
+        another user or the server does not answer in time
+    :raises ValueError: if the server closed the connection without a valid
+        header
+    """
+    stream = stream if stream is not None else sys.stdout
+    socket_path = socket_path or default_socket_path()
+    _check_owner(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps({
+            'images': list(images),
+            'intermediate': intermediate,
+            'format': output_format,
+            'encoding': encoding,
+            'sizes': sizes,
+            'focus': focus,
+            'descendants': descendants,
+            'max_depth': max_depth,
+            'max_children': max_children,
+        }) + '\n').encode('utf-8'))
+        answer = sock.makefile('rb')
+        header = json.loads(answer.readline().decode('utf-8'))
+        if 'error' not in header:
+            reader = codecs.getreader('utf-8')(answer)
+            chunk = reader.read(65536)
+            while chunk:
+                stream.write(chunk)
+                chunk = reader.read(65536)
+        answer.close()
+    finally:
+        sock.close()
+    return header
+
+
+def _check_owner(socket_path):
+    """
+    make sure the socket was created by a server of the current user, another
+    user could answer queries with a fake tree
+    :raises socket.error: if the socket is missing or belongs to another user
+    """
+    try:
+        owner = os.lstat(socket_path).st_uid
+    except OSError as error:
+        raise socket.error(str(error))
+    if owner != os.getuid():
+        raise socket.error(
+            '{0} belongs to another user, not asking it'.format(socket_path))
+
+
+def _remove_stale_socket(socket_path):
+    """
+    remove the socket file of a server that is not running anymore
+    :raises socket.error: if a server is still listening on the socket
+    """
+    if not os.path.exists(socket_path):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except socket.error:
+        os.unlink(socket_path)
+    else:
+        raise socket.error(
+            'a server is already listening on {0}'.format(socket_path))
+    finally:
+        sock.close()
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+"""
+Save analyzed layers to a compact binary file and map it back into memory
+without decoding it.
+
+A snapshot starts with a magic line and a line of json describing every
+column of a LayerTable (type code, item size, offset and length). The columns
+follow as raw arrays aligned to 8 bytes. Identifiers and tags are stored once
+in a string table, the other columns refer to them by number.
+"""
+
+from __future__ import absolute_import
+from array import array
+import json
+import mmap
+import os
+import sys
+
+from .LayerTable import INT64, LayerTable
+from .PrefixIndex import PrefixIndex
+
+MAGIC = b'DOCKGRAPH SNAPSHOT\n'
+VERSION = 2
+
+# type codes of the columns: positions of layers or strings, byte offsets
+# into the string data and sizes
+POSITION = 'i'
+OFFSET = 'l'
+SIZE = INT64
+
+
+class StringTable(object):
+    """
+    sequence of the strings of a snapshot, a string is decoded on access
+    """
+
+    def __init__(self, offsets, data, indices=None, count=None, base=0):
+        """
+        :param offsets: byte offsets of the strings in data, string i is
+            data[base+offsets[i]:base+offsets[i+1]]
+        :param data: buffer with the utf-8 encoded strings
+        :param indices: numbers of the strings in this sequence (optional,
+            default: all strings in order)
+        :param count: use only the first count strings (without indices)
+        :param base: offset of the first string in data
+        """
+        self.offsets = offsets
+        self.data = data
+        self.base = base
+        self.indices = indices
+        if indices is not None:
+            self._len = len(indices)
+        elif count is not None:
+            self._len = count
+        else:
+            self._len = len(offsets) - 1
+
+    def __len__(self):
+        """:return: the number of strings"""
+        return self._len
+
+    def __getitem__(self, item):
+        """
+        :param item: position or slice
+        :return: the decoded string or a list of strings for a slice
+        """
+        if isinstance(item, slice):
+            return [self[pos] for pos in range(*item.indices(self._len))]
+        if item < 0:
+            item += self._len
+        if not 0 <= item < self._len:
+            raise IndexError('string table index out of range')
+        if self.indices is not None:
+            item = self.indices[item]
+        start = self.base + self.offsets[item]
+        end = self.base + self.offsets[item + 1]
+        return self.data[start:end].decode('utf-8')
+
+
+def save(table, path):
+    """
+    write a table to a snapshot file
+    :param table: the LayerTable to save
+    :param path: path of the snapshot file
+    """
+    import tempfile
+
+    # identifiers come first in the string table, followed by unique tags
+    strings = list(table.identifiers)
+    numbers = {}
+    tag_strings = array(POSITION)
+    for tag in table.tag_names:
+        if tag not in numbers:
+            numbers[tag] = len(strings)
+            strings.append(tag)
+        tag_strings.append(numbers[tag])
+
+    # (key, number of the key string, position of the layer)
+    pairs = [(layer_id, pos, pos)
+             for pos, layer_id in enumerate(table.identifiers)]
+    for pos in range(len(table)):
+        pairs.extend((tag, numbers[tag], pos) for tag in table.tags(pos))
+    pairs.sort()
+
+    encoded = [string.encode('utf-8') for string in strings]
+    string_offsets = array(OFFSET, [0])
+    for string in encoded:
+        string_offsets.append(string_offsets[-1] + len(string))
+
+    columns = [
+        ('parents', array(POSITION, table.parents)),
+        ('sizes', array(SIZE, table.sizes)),
+        ('tag_offsets', array(POSITION, table.tag_offsets)),
+        ('tag_strings', tag_strings),
+        ('child_offsets', array(POSITION, table.child_offsets)),
+        ('child_positions', array(POSITION, table.child_positions)),
+        ('roots', array(POSITION, table.roots())),
+        ('index_keys', array(POSITION, (key for _, key, _ in pairs))),
+        ('index_values', array(POSITION, (pos for _, _, pos in pairs))),
+        ('string_offsets', string_offsets),
+        ('string_data', array('B', b''.join(encoded))),
+    ]
+    header = {
+        'version': VERSION,
+        'byteorder': sys.byteorder,
+        'layers': len(table),
+        'strings': len(strings),
+        'columns': {},
+    }
+    offset = 0
+    for name, column in columns:
+        header['columns'][name] = [
+            column.typecode, column.itemsize, offset, len(column)]
+        offset = _align(offset + column.itemsize * len(column))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        # mkstemp creates the file readable by the owner only, give the
+        # snapshot the mode open() would
+        os.chmod(tmp_path, 0o666 & ~_umask())
+        with os.fdopen(handle, 'wb') as snapshot_file:
+            snapshot_file.write(MAGIC)
+            snapshot_file.write(json.dumps(header).encode('utf-8') + b'\n')
+            start = _align(snapshot_file.tell())
+            for name, column in columns:
+                _, _, offset, _ = header['columns'][name]
+                snapshot_file.write(
+                    b'\0' * (start + offset - snapshot_file.tell()))
+                snapshot_file.write(_tobytes(column))
+        os.rename(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load(path):
+    """
+    map a snapshot file into memory. The columns are not copied and strings
+    are decoded on access, so loading takes the same time for any size.
+    :param path: path of the snapshot file
+    :return: the table of the snapshot
+    :rtype: LayerTable
+    :raises ValueError: if the file is no snapshot of this platform
+    """
+    with open(path, 'rb') as snapshot_file:
+        if snapshot_file.readline() != MAGIC:
+            raise ValueError('{0} is no dockgraph snapshot'.format(path))
+        header = json.loads(snapshot_file.readline().decode('utf-8'))
+        start = _align(snapshot_file.tell())
+        buf = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if not isinstance(header, dict) or header.get('version') != VERSION or \
+            header.get('byteorder') != sys.byteorder:
+        raise ValueError(
+            '{0} is a snapshot of another version or platform'.format(path))
+
+    try:
+        _check_header(header, len(buf) - start)
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError('{0} is a corrupt snapshot: {1}'.format(path, error))
+
+    columns = {}
+    for name, (typecode, itemsize, offset, count) in \
+            header['columns'].items():
+        if array(typecode).itemsize != itemsize:
+            raise ValueError(
+                '{0} is a snapshot of another platform'.format(path))
+        columns[name] = _column(buf, start + offset, typecode, count)
+    if columns['string_offsets'][-1] > len(columns['string_data']):
+        raise ValueError('{0} is a corrupt snapshot: the strings end after '
+                         'the string data'.format(path))
+
+    offsets = columns['string_offsets']
+    base = start + header['columns']['string_data'][2]
+    return LayerTable(
+        identifiers=StringTable(
+            offsets, buf, count=header['layers'], base=base),
+        parents=columns['parents'],
+        sizes=columns['sizes'],
+        tag_offsets=columns['tag_offsets'],
+        tag_names=StringTable(
+            offsets, buf, columns['tag_strings'], base=base),
+        children=(columns['child_offsets'], columns['child_positions']),
+        roots=columns['roots'],
+        index=PrefixIndex.from_sorted(
+            StringTable(offsets, buf, columns['index_keys'], base=base),
+            columns['index_values'],
+        ),
+    )
+
+
+def _check_header(header, size):
+    """
+    :param header: the decoded header of a snapshot
+    :param size: number of bytes after the header
+    :raises ValueError: if a column does not fit in size bytes or has the
+        wrong length
+    """
+    layers = header['layers']
+    counts = {
+        'parents': layers,
+        'sizes': layers,
+        'roots': layers,
+        'tag_offsets': layers + 1,
+        'child_offsets': layers + 1,
+        'string_offsets': header['strings'] + 1,
+    }
+    if header['strings'] < layers:
+        raise ValueError('fewer strings than layers')
+    for name in ('parents', 'sizes', 'tag_offsets', 'tag_strings',
+                 'child_offsets', 'child_positions', 'roots', 'index_keys',
+                 'index_values', 'string_offsets', 'string_data'):
+        _, itemsize, offset, count = header['columns'][name]
+        if offset < 0 or count < 0 or offset + itemsize * count > size:
+            raise ValueError('column {0} ends after the file'.format(name))
+        if name in counts and count != counts[name]:
+            raise ValueError('column {0} has {1} entries instead of '
+                             '{2}'.format(name, count, counts[name]))
+
+
+def _umask():
+    """:return: the umask of the process"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def _align(offset):
+    """:return: offset rounded up to a multiple of 8"""
+    return (offset + 7) // 8 * 8
+
+
+def _tobytes(column):
+    """:return: the raw bytes of an array"""
+    try:
+        return column.tobytes()
+    except AttributeError:  # python 2
+        return column.tostring()
+
+
+def _column(buf, offset, typecode, count):
+    """
+    :param buf: the mapped snapshot file
+    :return: a column of the snapshot without copying it if possible
+    :rtype: memoryview or array
+    """
+    size = array(typecode).itemsize * count
+    try:
+        return memoryview(buf)[offset:offset + size].cast(typecode)
+    except AttributeError:  # python 2, memoryview has no cast
+        column = array(typecode)
+        column.fromstring(buf[offset:offset + size])
+        return column
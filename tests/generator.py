@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""Generate synthetic image lists with the shape of real docker daemons"""
+
+import math
+import random
+
+
+def generate_images(count, base_count=10, base_depth=(5, 30),
+                    image_depth=(1, 10), branch_ratio=0.2, popularity=1.0,
+                    untagged_ratio=0.1, max_tags=2,
+                    layer_size=(16*1024*1024, 2.0), seed=None):
+    """
+    generate a list of images like it's provided by docker api.
+    There are base_count base images, each a chain of untagged layers with a
+    tagged top. All other layers belong to images built on top of a base
+    image, each a chain of untagged layers with a (usually) tagged top.
+    :param count: total number of layers
+    :param base_count: number of base images (heads)
+    :param base_depth: (min, max) layers of a base image or a function
+        returning the depth for a random.Random instance
+    :param image_depth: (min, max) layers added by an image built on a base
+        image or a function like for base_depth
+    :param branch_ratio: probability that an image is built on an
+        intermediate layer of its base image instead of its top
+    :param popularity: skew of the choice of base images, the i-th base is
+        chosen with weight 1 / (i + 1) ** popularity (0: uniform)
+    :param untagged_ratio: probability that the top of an image is untagged
+        (a dangling image)
+    :param max_tags: maximum number of tags of a tagged image
+    :param layer_size: (median, sigma) of the log-normal distributed size a
+        layer adds to its parent
+    :param seed: seed of the random generator for reproducible lists
+    :return: list of dicts of images, newest first like docker api
+    :rtype: list
+    """
+    rng = random.Random(seed)
+    images = []
+    bases = []
+
+    def add_chain(parent, depth, tagged):
+        """add a chain of depth layers on top of parent and return it"""
+        chain = []
+        for _ in range(min(depth, count - len(images))):
+            image = _generate_image(rng, parent, layer_size)
+            images.append(image)
+            chain.append(image)
+            parent = image
+        if chain and tagged:
+            name = 'repo{0}/image{1}'.format(len(bases), len(images))
+            chain[-1]['RepoTags'] = [
+                '{0}:{1}'.format(name, tag)
+                for tag in range(rng.randint(1, max_tags))
+            ]
+        return chain
+
+    for _ in range(base_count):
+        chain = add_chain(None, _depth(rng, base_depth), tagged=True)
+        if chain:
+            bases.append(chain)
+
+    weights = [1.0 / (pos + 1) ** popularity for pos in range(len(bases))]
+    while len(images) < count and bases:
+        base = _weighted_choice(rng, bases, weights)
+        parent = rng.choice(base) if rng.random() < branch_ratio \
+            else base[-1]
+        add_chain(
+            parent,
+            _depth(rng, image_depth),
+            tagged=rng.random() >= untagged_ratio,
+        )
+
+    images.reverse()
+    return images
+
+
+def _generate_image(rng, parent, layer_size):
+    """:return: an untagged image dict on top of parent (dict or None)"""
+    median, sigma = layer_size
+    size = int(rng.lognormvariate(math.log(median), sigma))
+    return {
+        'Created': rng.randint(0, 3000000000),
+        'Id': '{0:064x}'.format(rng.getrandbits(256)),
+        'ParentId': parent['Id'] if parent else '',
+        'Labels': {},
+        'RepoTags': ['<none>:<none>'],
+        'RepoDigests': [],
+        'Size': size,
+        'VirtualSize': size + (parent['VirtualSize'] if parent else 0),
+    }
+
+
+def _depth(rng, depth):
+    """:return: a random depth from a (min, max) tuple or a function"""
+    if callable(depth):
+        return max(1, depth(rng))
+    return rng.randint(*depth)
+
+
+def _weighted_choice(rng, items, weights):
+    """:return: a random item chosen according to weights"""
+    point = rng.random() * sum(weights)
+    for item, weight in zip(items, weights):
+        point -= weight
+        if point < 0:
+            return item
+    return items[-1]
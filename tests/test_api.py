@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""Test fetching the image lists of the docker api"""
+
+import unittest
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.helper import generate_random_api_layer
+
+from dockgraph import api
+
+
+class TestApi(unittest.TestCase):
+
+    def setUp(self):
+        """generate images of two hosts sharing a base image"""
+        self.base = generate_random_api_layer()
+        self.base['RepoTags'] = ['base:1']
+        self.hosts = {}
+        for host in ('tcp://a:2375', 'tcp://b:2375'):
+            image = generate_random_api_layer()
+            image['ParentId'] = self.base['Id']
+            self.hosts[host] = [image, dict(self.base)]
+
+    def tearDown(self):
+        """forget the clients and settings of the tests"""
+        api._clients.clear()
+        api._settings.update(
+            base_url=None, timeout=api.DEFAULT_TIMEOUT, version=None)
+
+    def test_get_client(self):
+        """test if a client is shared by all calls with the same settings"""
+        client = api.get_client()
+        self.assertIs(client, api.get_client())
+        self.assertEqual(api.DEFAULT_TIMEOUT, client.timeout)
+        other = api.get_client('tcp://a:2375', timeout=3, version='1.21')
+        self.assertIsNot(client, other)
+        self.assertEqual(3, other.timeout)
+        self.assertEqual('1.21', other.api_version)
+        self.assertIs(other, api.get_client('tcp://a:2375', 3, '1.21'))
+
+    def test_configure(self):
+        """test if configure changes the defaults of get_client"""
+        client = api.get_client()
+        api.configure(timeout=5, version='1.20')
+        configured = api.get_client()
+        self.assertIsNot(client, configured)
+        self.assertEqual(5, configured.timeout)
+        self.assertEqual('1.20', configured.api_version)
+        api.configure()
+        self.assertIs(configured, api.get_client())
+
+    def test_merge_images(self):
+        """test if images are merged by id with their hosts"""
+        images = api.merge_images(sorted(self.hosts.items()))
+        self.assertEqual(3, len(images))
+        by_id = dict((image['Id'], image) for image in images)
+        self.assertEqual(
+            ['tcp://a:2375', 'tcp://b:2375'], by_id[self.base['Id']]['Hosts'])
+        for host, host_images in self.hosts.items():
+            self.assertEqual([host], by_id[host_images[0]['Id']]['Hosts'])
+
+    def test_merge_tags(self):
+        """test if the tags of an image are the union of all hosts"""
+        untagged = dict(self.base, RepoTags=['<none>:<none>'])
+        retagged = dict(self.base, RepoTags=['base:latest', 'base:1'])
+        images = api.merge_images([
+            ('a', [untagged]), ('b', [self.base]), ('c', [retagged]),
+            ('d', [untagged]),
+        ])
+        self.assertEqual(['base:1', 'base:latest'], images[0]['RepoTags'])
+        self.assertEqual(['a', 'b', 'c', 'd'], images[0]['Hosts'])
+        self.assertEqual(['base:1'], self.base['RepoTags'])
+        images = api.merge_images([('a', [untagged]), ('b', [untagged])])
+        self.assertEqual(['<none>:<none>'], images[0]['RepoTags'])
+
+    def test_fetch_hosts(self):
+        """test if all hosts are fetched in parallel"""
+        threads = set()
+        lock = threading.Lock()
+
+        def fetch(base_url):
+            """remember the thread and return the images of the host"""
+            with lock:
+                threads.add(threading.current_thread().ident)
+            return self.hosts[base_url]
+
+        images = api.fetch_hosts(sorted(self.hosts), fetch=fetch)
+        self.assertEqual(3, len(images))
+        self.assertEqual(['tcp://a:2375', 'tcp://b:2375'], images[1]['Hosts'])
+        self.assertNotIn(threading.current_thread().ident, threads)
+
+    def test_fetch_hosts_errors(self):
+        """test if the images of the reachable hosts are merged"""
+        def fetch(base_url):
+            """fail for one host"""
+            if base_url == 'tcp://down:2375':
+                raise IOError('connection refused')
+            return self.hosts[base_url]
+
+        urls = sorted(self.hosts) + ['tcp://down:2375']
+        errors = []
+        images = api.fetch_hosts(urls, fetch=fetch, errors=errors)
+        self.assertEqual(3, len(images))
+        self.assertEqual(1, len(errors))
+        base_url, error = errors[0]
+        self.assertEqual('tcp://down:2375', base_url)
+        self.assertIsInstance(error, IOError)
+        self.assertRaises(IOError, api.fetch_hosts, urls, fetch=fetch)
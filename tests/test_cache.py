@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""Test the on-disk cache of the image list"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.helper import generate_random_api_layer
+
+from dockgraph import cache
+
+
+class FakeClient(object):
+    """docker client returning a fixed image count and events"""
+
+    def __init__(self, count, events=None):
+        self.count = count
+        self.events_list = events or []
+
+    def info(self):
+        """:return: daemon info with the image count"""
+        return {'Images': self.count}
+
+    def events(self, since=None, until=None, decode=None):
+        """:return: the events between since and until"""
+        return iter(
+            event for event in self.events_list
+            if since <= event['time'] <= until
+        )
+
+
+class TestCache(unittest.TestCase):
+    """Test the on-disk cache of the image list"""
+
+    def setUp(self):
+        """create a temporary cache file"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'dockgraph', 'images.json')
+        self.images = [generate_random_api_layer() for _ in range(5)]
+
+    def tearDown(self):
+        """remove the temporary cache file"""
+        shutil.rmtree(self.tmpdir)
+
+    def test_cache_path(self):
+        """test that the cache is located in $XDG_CACHE_HOME"""
+        old = os.environ.get('XDG_CACHE_HOME')
+        os.environ['XDG_CACHE_HOME'] = self.tmpdir
+        try:
+            self.assertEqual(
+                cache.cache_path(),
+                os.path.join(self.tmpdir, 'dockgraph', 'images.json')
+            )
+        finally:
+            if old is None:
+                del os.environ['XDG_CACHE_HOME']
+            else:
+                os.environ['XDG_CACHE_HOME'] = old
+
+    def test_missing(self):
+        """test loading without a cache file"""
+        self.assertIsNone(cache.load(path=self.path))
+
+    def test_store_load(self):
+        """test that a stored list is loaded again"""
+        cache.store(self.images, path=self.path)
+        self.assertListEqual(cache.load(path=self.path), self.images)
+
+    def test_ttl(self):
+        """test that an expired cache is not used"""
+        cache.store(self.images, path=self.path)
+        self.assertIsNone(cache.load(ttl=-1, path=self.path))
+
+    def test_fingerprint_count(self):
+        """test that the cache is invalidated if the image count changes"""
+        cache.store(self.images, FakeClient(5), path=self.path)
+        self.assertListEqual(
+            cache.load(FakeClient(5), path=self.path), self.images)
+        self.assertIsNone(cache.load(FakeClient(6), path=self.path))
+
+    def test_fingerprint_events(self):
+        """test that the cache is invalidated by image events"""
+        cache.store(self.images, FakeClient(5), path=self.path)
+        now = int(time.time())
+        container_event = {'status': 'start', 'id': 'abc', 'time': now}
+        image_event = {'status': 'tag', 'id': 'abc', 'time': now}
+        self.assertListEqual(
+            cache.load(FakeClient(5, [container_event]), path=self.path),
+            self.images
+        )
+        self.assertIsNone(
+            cache.load(FakeClient(5, [image_event]), path=self.path))
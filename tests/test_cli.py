@@ -7,6 +7,9 @@ import sys
 import os
 import json
 import re
+import io
+import shutil
+import tempfile
 
 sys.path.insert(0, os.path.abspath('.'))
 
@@ -15,6 +18,7 @@ from tests.helper import generate_random_layer
 from tests.helper import connect_layers_random
 
 from bin import dockgraph_cli as cli
+from dockgraph import printer
 from dockgraph.ImageLayer import ImageLayer
 from dockgraph.ImageLayer import _convert_size
 
@@ -50,28 +54,277 @@ class TestCli(unittest.TestCase):
                                                docker_images=api_list))
         self.assertIn(api_image_tag, suggestions)
 
+    def test_image_completer_intermediate(self):
+        """test that ids of intermediate layers are not suggested"""
+        parent = generate_random_api_layer()
+        parent['RepoTags'] = ['<none>:<none>']
+        child = generate_random_api_layer()
+        child['ParentId'] = parent['Id']
+        suggestions = list(cli.image_completer(
+            '', docker_images=[parent, child]))
+        self.assertNotIn(parent['Id'][:12], suggestions)
+        self.assertIn(child['Id'][:12], suggestions)
+
+    def test_read_specs(self):
+        """test reading images from a file"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'images')
+            with io.open(path, 'w', encoding='utf-8') as spec_file:
+                spec_file.write(u'foo:1\n\n# comment\n  abc123  \n')
+            self.assertEqual(['foo:1', 'abc123'], cli._read_specs(path))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_images_from_empty(self):
+        """test that an empty image list does not select all images"""
+        from dockgraph import profiling
+        stdin, stderr = sys.stdin, sys.stderr
+        sys.stdin = io.StringIO(u'# no images\n')
+        # a real file, python 2 writes byte strings to stderr
+        sys.stderr = tempfile.TemporaryFile('w+')
+        try:
+            with self.assertRaises(SystemExit) as context:
+                cli._run(cli.parse_args(['--images-from', '-']),
+                         profiling.NullProfiler())
+            sys.stderr.seek(0)
+            self.assertIn('No images listed in -', sys.stderr.read())
+        finally:
+            sys.stderr.close()
+            sys.stdin, sys.stderr = stdin, stderr
+        self.assertEqual(1, context.exception.code)
+
+    def test_parse_args_invalid(self):
+        """test that options which would be ignored are rejected"""
+        self.assertTrue(cli.parse_args(['--paths', 'foo']).focus)
+        self.assertTrue(cli.parse_args(
+            ['--paths', '--descendants', '--images-from', '-']).descendants)
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            for argv in (['--paths', '--top', '3', 'foo'], ['--paths'],
+                         ['--descendants', 'foo'],
+                         ['--descendants', '--top', '3']):
+                with self.assertRaises(SystemExit):
+                    cli.parse_args(argv)
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+
+    def test_use_server(self):
+        """test that options the server cannot answer bypass it"""
+        self.assertTrue(cli._use_server(cli.parse_args([])))
+        self.assertTrue(cli._use_server(cli.parse_args(['-i', 'foo'])))
+        for argv in (['--no-server'], ['--no-cache'], ['--cache-ttl', '5'],
+                     ['--timeout', '5'], ['--api-version', 'auto'],
+                     ['--input', 'images.json'], ['-H', 'tcp://host:2375'],
+                     ['--top', '3'], ['--save-snapshot', 'layers.snap']):
+            self.assertFalse(cli._use_server(cli.parse_args(argv)), argv)
+
+    def test_serve_fetch_stdin(self):
+        """test that the images of stdin are served on every refresh"""
+        images = [generate_random_api_layer() for _ in range(3)]
+        stdin = sys.stdin
+        sys.stdin = io.StringIO(json.dumps(images))
+        try:
+            fetch = cli._serve_fetch(
+                cli.parse_args(['--serve', '--input', '-']))
+        finally:
+            sys.stdin = stdin
+        self.assertEqual(images, fetch())
+        self.assertEqual(images, fetch())
+
     def test_print_tree_invalid(self):
         """test the print_tree function with an invalid output_format"""
         self.assertRaises(
-            ValueError, cli.print_tree, self.heads, output_format='foobar')
+            ValueError, printer.print_tree, self.heads, output_format='foobar')
 
     def test_print_tree_json(self):
         """test the print_tree function with json as output_format"""
-        text = cli.print_tree(self.heads, output_format='json')
+        text = printer.print_tree(self.heads, output_format='json')
         json_heads = json.loads(text)
         self.assertEqual(len(json_heads), len(self.heads))
         for i, layer in enumerate(self.heads):
             self.assertDictEqual(json_heads[i], dict(layer))
 
+    def test_print_tree_json_streamed(self):
+        """test that the json output is encoded like json.dumps"""
+        self.assertEqual(
+            printer.print_tree(self.heads, output_format='json'),
+            json.dumps([dict(layer) for layer in self.heads])
+        )
+        self.assertEqual(printer.print_tree([], output_format='json'), '[]')
+
+    def test_print_tree_ndjson(self):
+        """test the print_tree function with ndjson as output_format"""
+        text = printer.print_tree(self.heads, output_format='ndjson')
+        records = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual(len(records), len(self.layers))
+        seen = set([''])
+        for record in records:
+            self.assertNotIn('Children', record)
+            # parents are printed before their children
+            self.assertIn(record['ParentId'], seen)
+            seen.add(record['Id'])
+        for layer in self.layers:
+            self.assertIn(layer.identifier, seen)
+
+    def test_print_tree_sizes(self):
+        """test if the subtree sizes are printed in every output_format"""
+        text = printer.print_tree(self.heads, output_format='json', sizes=True)
+        json_heads = json.loads(text)
+        for i, layer in enumerate(self.heads):
+            self.assertEqual(
+                json_heads[i]['UniqueSize'], layer.subtree.unique)
+            self.assertEqual(
+                json_heads[i]['Descendants'], layer.subtree.descendants)
+            self.assertEqual(
+                len(json_heads[i]['Children']), len(layer.children))
+        text = printer.print_tree(
+            self.heads, output_format='ndjson', sizes=True)
+        records = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual(len(records), len(self.layers))
+        for record in records:
+            self.assertIn('ReclaimableSize', record)
+            self.assertIn('SharedSize', record)
+        text = printer.print_tree(self.heads, sizes=True)
+        for layer in self.layers:
+            self.assertIn(
+                'Reclaimable: {0}'.format(
+                    _convert_size(layer.subtree.reclaimable)),
+                text)
+
+    def test_print_tree_children(self):
+        """test printing only the given children of layers"""
+        head = self.heads[0]
+        children = dict((layer.identifier, []) for layer in self.heads)
+        for output_format in ('text', 'json', 'ndjson'):
+            self.assertEqual(
+                printer.print_tree(
+                    self.heads, output_format=output_format,
+                    children=children),
+                printer.print_tree(
+                    [ImageLayer(layer.identifier, layer.tags, layer.size)
+                     for layer in self.heads],
+                    output_format=output_format))
+        # layers without an entry print all of their children
+        self.assertEqual(
+            printer.print_tree([head], children={}),
+            printer.print_tree([head]))
+
+    def test_print_tree_limits(self):
+        """test summarizing the children below max_depth and max_children"""
+        base = ImageLayer('a' * 64, ['base:1'], 100)
+        mid = ImageLayer('b' * 64, [], 150)
+        leaves = [
+            ImageLayer(str(i) * 64, ['leaf:{0}'.format(i)], 150 + i * 10)
+            for i in range(1, 4)
+        ]
+        ImageLayer.join_parent_child(parent=base, child=mid)
+        for leaf in leaves:
+            ImageLayer.join_parent_child(parent=mid, child=leaf)
+        lines = printer.print_tree(
+            [base], max_depth=0, encoding='utf-8').splitlines()
+        self.assertEqual(u'└── … 1 more child, 110 B', lines[1].strip())
+        self.assertEqual('1 heads, 1 layers', lines[-1])
+        lines = printer.print_tree([base], max_children=2).splitlines()
+        self.assertEqual(7, len(lines))
+        for line, leaf in zip(lines[2:4], leaves):
+            self.assertTrue(
+                line.startswith('      |- ' + leaf.identifier[:12]))
+        self.assertEqual('      `- ... 1 more child, 30 B', lines[4])
+        self.assertEqual('1 heads, 4 layers', lines[-1])
+        heads = json.loads(printer.print_tree(
+            [base], output_format='json', max_depth=1, max_children=2))
+        self.assertEqual(3, heads[0]['Children'][0]['ElidedChildren'])
+        self.assertEqual(60, heads[0]['Children'][0]['ElidedSize'])
+        self.assertNotIn('ElidedChildren', heads[0])
+        records = [
+            json.loads(line) for line in printer.print_tree(
+                [base], output_format='ndjson', max_children=2).splitlines()
+        ]
+        self.assertEqual(4, len(records))
+        self.assertEqual(1, records[1]['ElidedChildren'])
+        self.assertEqual(30, records[1]['ElidedSize'])
+        # without limits the output does not change
+        self.assertEqual(
+            printer.print_tree([base], output_format='json'),
+            printer.print_tree(
+                [base], output_format='json', max_depth=2, max_children=3))
+
+    def test_print_tree_limits_pruned(self):
+        """test that a pruned untagged parent is summarized only once"""
+        from dockgraph import dockgraph
+        api_list = [generate_random_api_layer() for _ in range(4)]
+        base, untagged, first, second = api_list
+        for image, tags, size, parent in (
+                (base, ['base:1'], 100, None),
+                (untagged, ['<none>:<none>'], 1100, base),
+                (first, ['first:1'], 1110, untagged),
+                (second, ['second:1'], 1120, untagged)):
+            image['RepoTags'] = tags
+            image['VirtualSize'] = size
+            image['ParentId'] = parent['Id'] if parent else ''
+        layers = dockgraph.analyze_layers(api_list)
+        dockgraph.compute_subtree_sizes(layers)
+        heads = dockgraph.get_heads(dockgraph.prune_untagged_layers(layers))
+        record = json.loads(printer.print_tree(
+            heads, output_format='ndjson', max_depth=0))
+        self.assertEqual(2, record['ElidedChildren'])
+        self.assertEqual(1030, record['ElidedSize'])
+        # the untagged parent is counted with the hidden child
+        records = [
+            json.loads(line) for line in printer.print_tree(
+                heads, output_format='ndjson', max_children=1).splitlines()
+        ]
+        self.assertEqual(1, records[0]['ElidedChildren'])
+        self.assertEqual(1020, records[0]['ElidedSize'])
+
+    def test_print_tree_hosts(self):
+        """test if the hosts of a layer are printed in every output_format"""
+        head = ImageLayer('a' * 64, ['base:1'], 100, hosts=['tcp://a:2375'])
+        self.assertIn(
+            "Hosts: ['tcp://a:2375']", printer.print_tree([head]))
+        self.assertEqual(
+            json.loads(printer.print_tree([head], output_format='json')),
+            [dict(head)])
+        self.assertEqual(['tcp://a:2375'], dict(head)['Hosts'])
+        record = json.loads(printer.print_tree([head], output_format='ndjson'))
+        self.assertEqual(['tcp://a:2375'], record['Hosts'])
+
     def test_print_tree_default(self):
         """test if the default output_format of print_tree is text"""
-        text = cli.print_tree(self.heads, output_format='text')
-        text_default = cli.print_tree(self.heads)
+        text = printer.print_tree(self.heads, output_format='text')
+        text_default = printer.print_tree(self.heads)
         self.assertEqual(text, text_default)
 
+    def test_write_tree(self):
+        """test that write_tree writes the same output as print_tree"""
+        for output_format in ('text', 'json'):
+            stream = io.StringIO()
+            printer.write_tree(self.heads, stream, output_format=output_format)
+            self.assertEqual(
+                stream.getvalue(),
+                printer.print_tree(self.heads, output_format=output_format)
+            )
+
+    def test_print_tree_deep_chain(self):
+        """test that deep chains do not hit the recursion limit"""
+        depth = sys.getrecursionlimit() + 100
+        chain = [generate_random_layer() for _ in range(depth)]
+        for parent, child in zip(chain[:-1], chain[1:]):
+            ImageLayer.join_parent_child(parent=parent, child=child)
+        text = printer.print_tree([chain[0]], output_format='text')
+        lines = text.splitlines()
+        self.assertEqual(len(lines), depth + 2)
+        self.assertEqual(
+            lines[-1], "1 heads, {0} layers".format(depth))
+        self.assertTrue(lines[depth - 1].startswith(
+            '   ' * (depth - 1) + '`- ' + chain[-1].identifier[:12]))
+
     def test_print_tree_text_ascii(self):
         """test the print_tree function with text as output_format and ascii"""
-        text = cli.print_tree(
+        text = printer.print_tree(
             self.heads,
             output_format='text',
             encoding='ascii'
@@ -132,7 +385,7 @@ class TestCli(unittest.TestCase):
 
     def test_print_tree_text_utf8(self):
         """test the print_tree function with text as output_format and utf-8"""
-        text = cli.print_tree(
+        text = printer.print_tree(
             self.heads,
             output_format='text',
             encoding='utf-8'
@@ -9,6 +9,7 @@ import os
 sys.path.insert(0, os.path.abspath('.'))
 
 from bin import dockgraph_cli as cli
+from dockgraph import cache
 
 
 class TestCliArgParse(unittest.TestCase):
@@ -41,6 +42,8 @@ class TestCliArgParse(unittest.TestCase):
         self.assertEqual('json', args.output_format)
         args = cli.parse_args('--format json'.split(' '))
         self.assertEqual('json', args.output_format)
+        args = cli.parse_args('--format ndjson'.split(' '))
+        self.assertEqual('ndjson', args.output_format)
 
     def test_encoding(self):
         """test if all encodings are parsed correctly"""
@@ -58,3 +61,82 @@ class TestCliArgParse(unittest.TestCase):
         self.assertEqual('utf-8', args.output_encoding)
         args = cli.parse_args('--encoding utf-8'.split(' '))
         self.assertEqual('utf-8', args.output_encoding)
+
+    def test_cache(self):
+        """test if the cache options are parsed correctly"""
+        args = cli.parse_args([])
+        self.assertEqual(True, args.use_cache)
+        self.assertEqual(cache.DEFAULT_TTL, args.cache_ttl)
+        args = cli.parse_args('--no-cache'.split(' '))
+        self.assertEqual(False, args.use_cache)
+        args = cli.parse_args('--cache-ttl 5'.split(' '))
+        self.assertEqual(5, args.cache_ttl)
+
+    def test_profile(self):
+        """test if the profile options are parsed correctly"""
+        args = cli.parse_args([])
+        self.assertEqual(False, args.profile)
+        self.assertEqual(None, args.profile_dump)
+        args = cli.parse_args('--profile'.split(' '))
+        self.assertEqual(True, args.profile)
+        args = cli.parse_args('--profile-dump out.prof'.split(' '))
+        self.assertEqual('out.prof', args.profile_dump)
+
+    def test_client(self):
+        """test if the docker client options are parsed correctly"""
+        args = cli.parse_args([])
+        self.assertEqual(None, args.timeout)
+        self.assertEqual(None, args.api_version)
+        args = cli.parse_args('--timeout 5 --api-version 1.21'.split(' '))
+        self.assertEqual(5, args.timeout)
+        self.assertEqual('1.21', args.api_version)
+
+    def test_sizes(self):
+        """test if the sizes option is parsed correctly"""
+        self.assertEqual(False, cli.parse_args([]).sizes)
+        self.assertEqual(True, cli.parse_args(['--sizes']).sizes)
+
+    def test_limits(self):
+        """test if the depth and width limits are parsed correctly"""
+        args = cli.parse_args([])
+        self.assertEqual(None, args.max_depth)
+        self.assertEqual(None, args.max_children)
+        args = cli.parse_args('--max-depth 2 --max-children 10'.split(' '))
+        self.assertEqual(2, args.max_depth)
+        self.assertEqual(10, args.max_children)
+        self.assertEqual(0, cli.parse_args(['--max-depth', '0']).max_depth)
+        for argv in (['--max-depth', '-1'], ['--max-children', '-1'],
+                     ['--top', '-1'], ['--top', 'x']):
+            with self.assertRaises(SystemExit):
+                cli.parse_args(argv)
+
+    def test_focus(self):
+        """test if the focus options are parsed correctly"""
+        args = cli.parse_args([])
+        self.assertEqual(False, args.focus)
+        self.assertEqual(False, args.descendants)
+        args = cli.parse_args('--paths --descendants foo'.split(' '))
+        self.assertEqual(True, args.focus)
+        self.assertEqual(True, args.descendants)
+
+    def test_top(self):
+        """test if the top options are parsed correctly"""
+        args = cli.parse_args([])
+        self.assertEqual(None, args.top)
+        self.assertEqual('size', args.sort)
+        args = cli.parse_args('--top 20 --sort depth'.split(' '))
+        self.assertEqual(20, args.top)
+        self.assertEqual('depth', args.sort)
+
+    def test_diff(self):
+        """test if the diff option is parsed correctly"""
+        self.assertEqual(None, cli.parse_args([]).diff)
+        args = cli.parse_args('--diff old.json new.json'.split(' '))
+        self.assertEqual(['old.json', 'new.json'], args.diff)
+
+    def test_images_from(self):
+        """test if the images-from option is parsed correctly"""
+        self.assertEqual(None, cli.parse_args([]).images_from)
+        args = cli.parse_args('--images-from - foo'.split(' '))
+        self.assertEqual('-', args.images_from)
+        self.assertEqual(['foo'], args.images)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""Test comparing two trees of layers"""
+
+import unittest
+import json
+import os
+import sys
+import shutil
+import tempfile
+from copy import deepcopy
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.helper import generate_random_api_layer
+
+from dockgraph import diff
+from dockgraph import dockgraph
+from dockgraph import snapshot
+from dockgraph.LayerTable import LayerTable
+
+
+class TestDiff(unittest.TestCase):
+    """Test comparing two trees of layers"""
+
+    def setUp(self):
+        """generate a chain of images and a changed copy of it"""
+        self.old = [generate_random_api_layer() for _ in range(6)]
+        for i, image in enumerate(self.old[:-1]):
+            image['ParentId'] = self.old[i + 1]['Id']
+        for i, image in enumerate(reversed(self.old)):
+            image['VirtualSize'] = (i + 1) * 100
+        self.old[2]['RepoTags'] = ['app:1']
+        self.new = deepcopy(self.old)
+        # remove the top, retag one layer and move another one to the base
+        removed = self.new.pop(0)
+        self.new[1]['RepoTags'] = ['app:2']
+        self.new[2]['ParentId'] = self.new[-1]['Id']
+        self.new[2]['VirtualSize'] = 150
+        added = generate_random_api_layer()
+        added['ParentId'] = removed['ParentId']
+        added['VirtualSize'] = self.new[0]['VirtualSize'] + 42
+        self.new.insert(0, added)
+        self.added, self.removed = added, removed
+
+    def test_diff_layers(self):
+        """test that all kinds of changes are found"""
+        changes = diff.diff_layers(
+            dockgraph.analyze_layers(self.old),
+            dockgraph.analyze_layers(self.new))
+        self.assertEqual(
+            [self.added['Id']], [record['Id'] for record in changes.added])
+        self.assertEqual(42, changes.added[0]['Size'])
+        self.assertEqual(
+            [self.removed['Id']],
+            [record['Id'] for record in changes.removed])
+        self.assertEqual(100, changes.removed[0]['Size'])
+        self.assertEqual(1, len(changes.retagged))
+        self.assertEqual(['app:1'], changes.retagged[0]['OldTags'])
+        self.assertEqual(['app:2'], changes.retagged[0]['NewTags'])
+        self.assertEqual(1, len(changes.reparented))
+        self.assertEqual(self.new[3]['Id'], changes.reparented[0]['Id'])
+        self.assertEqual(self.new[-1]['Id'],
+                         changes.reparented[0]['NewParentId'])
+        self.assertEqual(-150, changes.reparented[0]['SizeDelta'])
+
+    def test_diff_equal(self):
+        """test that equal trees have no changes"""
+        changes = diff.diff_layers(
+            dockgraph.analyze_layers(self.old),
+            dockgraph.analyze_layers(list(reversed(self.old))))
+        self.assertEqual(([], [], [], []), changes)
+
+    def test_print_diff(self):
+        """test the output formats"""
+        changes = diff.diff_layers(
+            dockgraph.analyze_layers(self.old),
+            dockgraph.analyze_layers(self.new))
+        text = diff.print_diff(changes)
+        self.assertIn(u'+ {0}'.format(self.added['Id'][:12]), text)
+        self.assertIn(u'- {0}'.format(self.removed['Id'][:12]), text)
+        self.assertTrue(text.endswith(
+            '1 added (42 B), 1 removed (100 B), 1 retagged, 1 re-parented'))
+        parsed = json.loads(diff.print_diff(changes, 'json'))
+        self.assertEqual(42, parsed['AddedSize'])
+        self.assertEqual(100, parsed['RemovedSize'])
+        records = [
+            json.loads(line) for line in
+            diff.print_diff(changes, 'ndjson').splitlines()
+        ]
+        self.assertEqual(
+            ['added', 'removed', 'retagged', 'reparented'],
+            [record['Change'] for record in records])
+        with self.assertRaises(ValueError):
+            diff.print_diff(changes, 'xml')
+
+    def test_load_layers(self):
+        """test loading image lists and snapshots"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            json_path = os.path.join(tmpdir, 'images.json')
+            with open(json_path, 'w') as json_file:
+                json.dump(self.old, json_file)
+            snapshot_path = os.path.join(tmpdir, 'layers.snapshot')
+            snapshot.save(LayerTable.from_images(self.old), snapshot_path)
+            from_json = diff.load_layers(json_path)
+            from_snapshot = diff.load_layers(snapshot_path)
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual(len(self.old), len(from_json))
+        self.assertEqual(
+            ([], [], [], []), diff.diff_layers(from_json, from_snapshot))
@@ -15,6 +15,7 @@ from tests.helper import generate_random_layer
 from tests.helper import connect_layers_random
 
 from dockgraph import dockgraph
+from dockgraph import printer
 from dockgraph.ImageLayer import ImageLayer
 
 
@@ -108,6 +109,72 @@ class Testdockgraph(unittest.TestCase):
                     "Parent should be None. There was no ParentId in API"
                 )
 
+    def test_analyze_layers_order(self):
+        """test if parents and children are linked in any order"""
+        api_list = [generate_random_api_layer() for _ in range(15)]
+        for i, api_layer in enumerate(api_list[:-1]):
+            api_layer['ParentId'] = random.choice(api_list[i+1:])['Id']
+        expected = dockgraph.analyze_layers(api_list)
+        for images in (list(reversed(api_list)), random.sample(api_list, 15)):
+            analyzed_dict = dockgraph.analyze_layers(images)
+            self.assertEqual(set(expected), set(analyzed_dict))
+            for layer_id, layer in analyzed_dict.items():
+                self.assertEqual(
+                    dict(expected[layer_id])['ParentId'],
+                    dict(layer)['ParentId'],
+                )
+                self.assertEqual(
+                    set(child.identifier
+                        for child in expected[layer_id].children),
+                    set(child.identifier for child in layer.children),
+                )
+                for child in layer.children:
+                    self.assertIs(child.parent, layer)
+
+    def test_analyze_layers_dangling_parent(self):
+        """test if layers with a parent not in the list become heads"""
+        api_list = [generate_random_api_layer() for _ in range(3)]
+        api_list[0]['ParentId'] = api_list[1]['Id']
+        api_list[1]['ParentId'] = 'f' * 64
+        api_list[2]['ParentId'] = 'f' * 64
+        analyzed_dict = dockgraph.analyze_layers(api_list, with_roots=True)
+        self.assertEqual(3, len(analyzed_dict))
+        self.assertNotIn('f' * 64, analyzed_dict)
+        head = analyzed_dict[api_list[1]['Id']]
+        self.assertTrue(head.is_head())
+        self.assertTrue(analyzed_dict[api_list[2]['Id']].is_head())
+        self.assertIs(head, analyzed_dict[api_list[0]['Id']].root)
+
+    def test_analyze_layers_iterator(self):
+        """test if analyze_layers consumes an iterator only once"""
+        api_list = [generate_random_api_layer() for _ in range(15)]
+        for i, api_layer in enumerate(api_list[:-1]):
+            api_layer['ParentId'] = random.choice(api_list[i+1:])['Id']
+        analyzed_dict = dockgraph.analyze_layers(
+            api_layer for api_layer in api_list)
+        self.assertEqual(len(api_list), len(analyzed_dict))
+        self.assertEqual(1, len(dockgraph.get_heads(analyzed_dict)))
+
+    def test_compute_roots(self):
+        """test that compute_roots caches the head of every layer"""
+        dockgraph.compute_roots(self.layers)
+        for layer in self.layers.values():
+            head = layer
+            while head.parent is not None:
+                head = head.parent
+            self.assertIs(layer.root, head)
+            self.assertTrue(layer.root.is_head())
+
+    def test_analyze_layers_with_roots(self):
+        """test the with_roots option of analyze_layers"""
+        api_list = [generate_random_api_layer() for _ in range(15)]
+        for i, api_layer in enumerate(api_list[:-1]):
+            api_layer['ParentId'] = random.choice(api_list[i+1:])['Id']
+        analyzed_dict = dockgraph.analyze_layers(api_list, with_roots=True)
+        head = analyzed_dict[api_list[-1]['Id']]
+        for layer in analyzed_dict.values():
+            self.assertIs(layer.root, head)
+
     def test_get_all_heads(self):
         """test the get_heads method returns a list of heads"""
         heads = dockgraph.get_heads(self.layers)
@@ -136,6 +203,192 @@ class Testdockgraph(unittest.TestCase):
         for layer in heads:
             self.assertTrue(layer.is_head())
 
+    def test_get_heads_with_index(self):
+        """test that get_heads returns the same heads with an index"""
+        index = dockgraph.build_index(self.static_layers)
+        for image in ['ezue4PoF7Im', 'foo1/bar:baz', 'foo3/bar:baz', 'foo']:
+            self.assertListEqual(
+                sorted(h.identifier for h in
+                       dockgraph.get_heads(self.static_layers, image, index)),
+                sorted(h.identifier for h in
+                       dockgraph.get_heads(self.static_layers, image)),
+            )
+        self.assertListEqual(
+            dockgraph.get_heads(self.static_layers, 'nonexistent', index), [])
+
+    def test_find_layers(self):
+        """test the find_layers function with and without an index"""
+        index = dockgraph.build_index(self.layers)
+        for identifier, layer in self.layers.items():
+            self.assertIn(
+                layer, dockgraph.find_layers(self.layers, identifier, index))
+            self.assertIn(
+                layer, dockgraph.find_layers(self.layers, identifier))
+            for tag in layer.tags:
+                self.assertIn(
+                    layer, dockgraph.find_layers(self.layers, tag, index))
+        index = dockgraph.build_index(self.static_layers)
+        self.assertEqual(
+            len(dockgraph.find_layers(self.static_layers, 'foo', index)), 3)
+
+    def _size_tree(self):
+        """
+        :return: a tree base - mid - tagged1 and base - tagged2 with an
+            untagged mid layer
+        """
+        api_list = [generate_random_api_layer() for _ in range(4)]
+        tagged1, mid, tagged2, base = api_list
+        for image, tags, size, parent in (
+                (base, ['base:1'], 100, None),
+                (mid, ['<none>:<none>'], 150, base),
+                (tagged1, ['tagged:1'], 200, mid),
+                (tagged2, ['tagged:2'], 130, base)):
+            image['RepoTags'] = tags
+            image['VirtualSize'] = size
+            image['ParentId'] = parent['Id'] if parent else ''
+        layers = dockgraph.analyze_layers(api_list)
+        return layers, [layers[image['Id']] for image in api_list]
+
+    def test_compute_subtree_sizes(self):
+        """test the unique, shared and reclaimable size of every subtree"""
+        layers, (tagged1, mid, tagged2, base) = self._size_tree()
+        dockgraph.compute_subtree_sizes(layers)
+        self.assertEqual((230, 0, 230, 3), base.subtree)
+        self.assertEqual((100, 100, 100, 1), mid.subtree)
+        # removing tagged1 also frees the untagged mid layer
+        self.assertEqual((50, 150, 100, 0), tagged1.subtree)
+        self.assertEqual((30, 100, 30, 0), tagged2.subtree)
+
+    def test_prune_keeps_subtree_sizes(self):
+        """test that pruned layers keep the sizes of the full tree"""
+        layers, (tagged1, _, _, base) = self._size_tree()
+        dockgraph.compute_subtree_sizes(layers)
+        pruned = dockgraph.prune_untagged_layers(layers)
+        self.assertEqual(3, len(pruned))
+        self.assertEqual(base.subtree, pruned[base.identifier].subtree)
+        self.assertEqual(tagged1.subtree, pruned[tagged1.identifier].subtree)
+
+    def test_top_layers(self):
+        """test the selection of the largest subtrees"""
+        layers, (tagged1, mid, tagged2, base) = self._size_tree()
+        # base adds the most, the other layers are part of its subtree
+        self.assertEqual([base], dockgraph.top_layers(layers, 3))
+        self.assertEqual(
+            [base], dockgraph.top_layers(layers, 1, sort='children'))
+        self.assertEqual(
+            [base], dockgraph.top_layers(layers, 2, sort='depth'))
+        self.assertEqual(
+            [mid, tagged2],
+            dockgraph.top_layers(layers, 5, heads=[mid, tagged2]))
+        self.assertEqual(
+            [tagged1, tagged2], dockgraph.top_layers(
+                layers, 5, heads=[tagged2, tagged1]))
+        self.assertEqual([], dockgraph.top_layers(layers, 0))
+        with self.assertRaises(ValueError):
+            dockgraph.top_layers(layers, 1, sort='name')
+
+    def test_top_layers_nested(self):
+        """test that a parent and its child are not both selected"""
+        layers, (tagged1, mid, tagged2, base) = self._size_tree()
+        other = ImageLayer(identifier='f' * 64, tags=['other:1'], size=120)
+        layers[other.identifier] = other
+        # by size: other 120, base 100, mid 50, tagged1 50, tagged2 30
+        self.assertEqual([other, base], dockgraph.top_layers(layers, 3))
+        # tagged1 is skipped, it belongs to the subtree of mid
+        self.assertEqual(
+            [mid, tagged2],
+            dockgraph.top_layers(layers, 3, heads=[tagged1, mid, tagged2]))
+        printed = printer.print_tree(dockgraph.top_layers(layers, 5))
+        self.assertEqual('2 heads, 5 layers', printed.splitlines()[-1])
+
+    def test_top_layers_inner(self):
+        """test that layers below the heads are selected by their size"""
+        api_list = [generate_random_api_layer() for _ in range(4)]
+        large, child, small, base = api_list
+        for image, tags, size, parent in (
+                (base, ['base:1'], 10, None),
+                (large, ['large:1'], 500, base),
+                (child, ['child:1'], 520, large),
+                (small, ['small:1'], 40, base)):
+            image['RepoTags'] = tags
+            image['VirtualSize'] = size
+            image['ParentId'] = parent['Id'] if parent else ''
+        layers = dockgraph.analyze_layers(api_list)
+        large, child, small, base = [
+            layers[image['Id']] for image in api_list]
+        # by size: large 490, small 30, child 20, base 10
+        self.assertEqual([large], dockgraph.top_layers(layers, 1))
+        self.assertEqual([large, small], dockgraph.top_layers(layers, 3))
+        printed = printer.print_tree(dockgraph.top_layers(layers, 1))
+        self.assertEqual('1 heads, 2 layers', printed.splitlines()[-1])
+
+    def test_resolve_images(self):
+        """test resolving many images with shared heads at once"""
+        layers, (tagged1, _, tagged2, base) = self._size_tree()
+        other = ImageLayer(identifier='f' * 64, tags=['other:1'])
+        layers[other.identifier] = other
+        resolution = dockgraph.resolve_images(
+            layers, ['tagged:1', 'other', 'tagged:2', 'missing', 'tagged'])
+        self.assertEqual([base, other], resolution.heads)
+        self.assertEqual(['missing'], resolution.missing)
+        self.assertEqual(1, len(resolution.ambiguous))
+        image, matches = resolution.ambiguous[0]
+        self.assertEqual('tagged', image)
+        self.assertEqual(set([tagged1, tagged2]), set(matches))
+        self.assertEqual(
+            [tagged1, other, tagged2], resolution.matches)
+        index = dockgraph.build_index(layers)
+        self.assertEqual(
+            resolution,
+            dockgraph.resolve_images(
+                layers,
+                ['tagged:1', 'other', 'tagged:2', 'missing', 'tagged'],
+                index),
+        )
+
+    def test_hosts(self):
+        """test that the hosts of merged images are kept by the layers"""
+        api_list = [generate_random_api_layer() for _ in range(2)]
+        api_list[0]['ParentId'] = api_list[1]['Id']
+        api_list[0]['RepoTags'] = ['child:1']
+        api_list[0]['Hosts'] = ['tcp://a:2375']
+        api_list[1]['RepoTags'] = ['<none>:<none>']
+        api_list[1]['Hosts'] = ['tcp://a:2375', 'tcp://b:2375']
+        layers = dockgraph.analyze_layers(api_list)
+        self.assertEqual(
+            ['tcp://a:2375', 'tcp://b:2375'], layers[api_list[1]['Id']].hosts)
+        pruned = dockgraph.prune_untagged_layers(layers)
+        self.assertEqual(['tcp://a:2375'], pruned[api_list[0]['Id']].hosts)
+        del api_list[0]['Hosts'], api_list[1]['Hosts']
+        layers = dockgraph.analyze_layers(api_list)
+        self.assertIsNone(layers[api_list[0]['Id']].hosts)
+
+    def test_focus_layers(self):
+        """test selecting the paths to matched layers"""
+        layers, (tagged1, mid, tagged2, base) = self._size_tree()
+        child = ImageLayer(identifier='f' * 64, tags=['child:1'])
+        ImageLayer.join_parent_child(parent=tagged1, child=child)
+        layers[child.identifier] = child
+        focus = dockgraph.focus_layers([tagged1])
+        self.assertEqual([base], focus.heads)
+        self.assertEqual({
+            base.identifier: [mid],
+            mid.identifier: [tagged1],
+            tagged1.identifier: [],
+        }, focus.children)
+        focus = dockgraph.focus_layers([tagged1], descendants=True)
+        self.assertEqual([base], focus.heads)
+        self.assertNotIn(tagged1.identifier, focus.children)
+        # the path to child is printed completely below tagged1
+        focus = dockgraph.focus_layers([child, tagged2, tagged1], True)
+        self.assertEqual([base], focus.heads)
+        self.assertEqual([mid, tagged2], focus.children[base.identifier])
+        self.assertNotIn(tagged2.identifier, focus.children)
+        self.assertNotIn(child.identifier, focus.children)
+        focus = dockgraph.focus_layers([base, tagged2])
+        self.assertEqual([base], focus.heads)
+        self.assertEqual([tagged2], focus.children[base.identifier])
+
     def test_remove_untagged_layers(self):
         """test the remove_untagged_layers function"""
         test_layers = deepcopy(self.layers)
@@ -173,6 +426,10 @@ class Testdockgraph(unittest.TestCase):
                     cur = cur.parent
                 if cur is None:
                     self.assertIsNone(tagged_layers[identifier].parent)
+                    self.assertIs(
+                        tagged_layers[identifier].root,
+                        tagged_layers[identifier],
+                    )
                 else:
                     self.assertEqual(
                         tagged_layers[identifier].parent.identifier,
@@ -180,3 +437,32 @@ class Testdockgraph(unittest.TestCase):
                     )
             else:
                 self.assertNotIn(identifier, tagged_layers.keys())
+
+    def test_prune_untagged_layers(self):
+        """test that prune_untagged_layers matches remove_untagged_layers"""
+        before = dict(
+            (identifier, dict(layer))
+            for identifier, layer in self.layers.items()
+        )
+        pruned = dockgraph.prune_untagged_layers(self.layers)
+        removed = dockgraph.remove_untagged_layers(self.layers)
+        # the original tree must not be modified
+        for identifier, layer in self.layers.items():
+            self.assertDictEqual(before[identifier], dict(layer))
+        self.assertSetEqual(set(pruned.keys()), set(removed.keys()))
+        for identifier, layer in pruned.items():
+            self.assertEqual(layer.identifier, identifier)
+            self.assertIsNot(layer, self.layers[identifier])
+            self.assertEqual(layer.size, removed[identifier].size)
+            self.assertListEqual(layer.tags, removed[identifier].tags)
+            self.assertEqual(
+                layer.parent.identifier if layer.parent else None,
+                removed[identifier].parent.identifier
+                if removed[identifier].parent else None,
+            )
+            self.assertSetEqual(
+                set(child.identifier for child in layer.children),
+                set(child.identifier for child in removed[identifier].children)
+            )
+            self.assertEqual(
+                layer.root.identifier, removed[identifier].root.identifier)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""Test the incremental updates from docker events"""
+
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.helper import generate_random_api_layer
+
+from dockgraph import dockgraph
+from dockgraph import events
+from dockgraph import printer
+
+
+class TestEvents(unittest.TestCase):
+    """Test the incremental updates from docker events"""
+
+    def setUp(self):
+        """create a daemon with a chain base <- middle <- leaf"""
+        self.base = generate_random_api_layer()
+        self.base['RepoTags'] = ['base:latest']
+        self.middle = generate_random_api_layer()
+        self.middle['RepoTags'] = ['<none>:<none>']
+        self.middle['ParentId'] = self.base['Id']
+        self.leaf = generate_random_api_layer()
+        self.leaf['RepoTags'] = ['leaf:latest']
+        self.leaf['ParentId'] = self.middle['Id']
+        self.daemon = {}
+        for image in (self.base, self.middle, self.leaf):
+            self.daemon[image['Id']] = image
+        self.layers = dockgraph.analyze_layers(
+            list(self.daemon.values()), with_roots=True)
+        self.index = dockgraph.build_index(self.layers)
+
+    def inspect_image(self, image_id):
+        """fake docker inspect by id or tag"""
+        for image in self.daemon.values():
+            if image['Id'] == image_id or image_id in image['RepoTags']:
+                return image
+        return None
+
+    def apply(self, *event_list):
+        """apply the events and return the ones that changed the tree"""
+        return list(events.follow_events(
+            self.layers, iter(event_list), self.inspect_image, self.index))
+
+    def assert_consistent(self):
+        """compare the tree with a tree analyzed from scratch"""
+        expected = dockgraph.analyze_layers(list(self.daemon.values()))
+        self.assertSetEqual(set(self.layers.keys()), set(expected.keys()))
+        for identifier, layer in self.layers.items():
+            self.assertListEqual(layer.tags, expected[identifier].tags)
+            self.assertEqual(
+                layer.parent.identifier if layer.parent else '',
+                dict(expected[identifier])['ParentId']
+            )
+            self.assertEqual(
+                layer.root.identifier, expected[identifier].root.identifier)
+        self.assertListEqual(
+            sorted(self.index.find('')),
+            sorted(dockgraph.build_index(expected).find(''))
+        )
+
+    def test_pull(self):
+        """test a pull with a new layer on top of an existing one"""
+        image = generate_random_api_layer()
+        image['RepoTags'] = ['new:1.0']
+        image['ParentId'] = self.base['Id']
+        self.daemon[image['Id']] = image
+        changed = self.apply({'status': 'pull', 'id': 'new:1.0', 'time': 0})
+        self.assertEqual(len(changed), 1)
+        self.assertIs(self.layers[image['Id']].root,
+                      self.layers[self.base['Id']])
+        self.assert_consistent()
+
+    def test_pull_missing_parents(self):
+        """test that missing ancestors are inspected and inserted"""
+        parent = generate_random_api_layer()
+        parent['RepoTags'] = ['<none>:<none>']
+        image = generate_random_api_layer()
+        image['RepoTags'] = ['other:latest']
+        image['ParentId'] = parent['Id']
+        self.daemon[parent['Id']] = parent
+        self.daemon[image['Id']] = image
+        self.apply({'status': 'pull', 'id': 'other:latest', 'time': 0})
+        self.assert_consistent()
+
+    def test_tag_move(self):
+        """test moving a tag from one image to another"""
+        self.base['RepoTags'] = ['base:latest', 'leaf:latest']
+        self.leaf['RepoTags'] = ['<none>:<none>']
+        changed = self.apply({'status': 'tag', 'id': self.base['Id']})
+        self.assertEqual(len(changed), 1)
+        self.assert_consistent()
+
+    def test_untag_delete(self):
+        """test removing the tag of the leaf and deleting it"""
+        self.leaf['RepoTags'] = ['<none>:<none>']
+        self.apply({'status': 'untag', 'id': self.leaf['Id']})
+        self.assert_consistent()
+        del self.daemon[self.leaf['Id']]
+        self.apply({'status': 'delete', 'id': self.leaf['Id']})
+        self.assert_consistent()
+
+    def test_delete_head(self):
+        """test that the children of a deleted head become heads"""
+        del self.daemon[self.base['Id']]
+        self.middle['ParentId'] = ''
+        self.apply({'status': 'delete', 'id': self.base['Id']})
+        self.assert_consistent()
+
+    def test_sizes(self):
+        """test that cached subtree sizes are updated after events"""
+        image = generate_random_api_layer()
+        image['RepoTags'] = ['new:1.0']
+        image['ParentId'] = self.middle['Id']
+
+        def pull():
+            self.daemon[image['Id']] = image
+            return {'status': 'pull', 'id': 'new:1.0'}
+
+        def tag():
+            self.middle['RepoTags'] = ['middle:1']
+            return {'status': 'tag', 'id': self.middle['Id']}
+
+        def delete():
+            del self.daemon[self.leaf['Id']]
+            return {'status': 'delete', 'id': self.leaf['Id']}
+
+        for change in (pull, tag, delete):
+            dockgraph.compute_subtree_sizes(self.layers)
+            self.apply(change())
+            heads = dockgraph.get_heads(self.layers)
+            # computes the sizes that were dropped
+            printer.print_tree(heads, sizes=True)
+            expected = dockgraph.analyze_layers(self.daemon.values())
+            dockgraph.compute_subtree_sizes(expected)
+            self.assertEqual(sorted(expected), sorted(self.layers))
+            for identifier, layer in self.layers.items():
+                self.assertEqual(expected[identifier].subtree, layer.subtree)
+
+    def test_ignored_events(self):
+        """test that other events do not change the tree"""
+        changed = self.apply(
+            {'status': 'start', 'id': 'abc', 'from': 'base:latest'},
+            {'Type': 'container', 'Action': 'tag', 'id': 'abc'},
+            {'status': 'delete', 'id': 'unknown'},
+            {'status': 'tag', 'id': self.leaf['Id']},
+            {'status': 'untag', 'id': 'unknown'},
+        )
+        self.assertListEqual(changed, [])
+        self.assert_consistent()
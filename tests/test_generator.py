@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""Test the synthetic image list generator"""
+
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.generator import generate_images
+
+from dockgraph import dockgraph
+
+
+class TestGenerator(unittest.TestCase):
+    """Test the synthetic image list generator"""
+
+    def test_count(self):
+        """test that exactly count layers are generated"""
+        for count in (0, 1, 10, 500):
+            self.assertEqual(len(generate_images(count, seed=1)), count)
+
+    def test_seed(self):
+        """test that the same seed generates the same list"""
+        self.assertListEqual(
+            generate_images(200, seed=42), generate_images(200, seed=42))
+        self.assertNotEqual(
+            generate_images(200, seed=42), generate_images(200, seed=43))
+
+    def test_shape(self):
+        """test the heads, parents and sizes of the generated tree"""
+        images = generate_images(
+            1000, base_count=7, base_depth=(3, 3), branch_ratio=0, seed=3)
+        layers = dockgraph.analyze_layers(images)
+        self.assertEqual(len(layers), 1000)
+        heads = dockgraph.get_heads(layers)
+        self.assertEqual(len(heads), 7)
+        for layer in layers.values():
+            if layer.parent is not None:
+                self.assertGreaterEqual(layer.size, layer.parent.size)
+        # the tops of the base images are tagged
+        for head in heads:
+            self.assertTrue(head.children[0].children[0].tags)
+
+    def test_depth_function(self):
+        """test depths given as functions"""
+        images = generate_images(
+            100, base_count=1, base_depth=lambda rng: 100, seed=0)
+        layers = dockgraph.analyze_layers(images)
+        self.assertEqual(len(dockgraph.get_heads(layers)), 1)
+        tagged = [layer for layer in layers.values() if layer.tags]
+        self.assertEqual(len(tagged), 1)
+        self.assertEqual(tagged[0].children, [])
+
+    def test_untagged_ratio(self):
+        """test that images are tagged according to untagged_ratio"""
+        images = generate_images(
+            300, image_depth=(1, 1), untagged_ratio=0.0, seed=5)
+        layers = dockgraph.analyze_layers(images)
+        for layer in layers.values():
+            if not layer.children:
+                self.assertTrue(layer.tags)
+        images = generate_images(
+            300, image_depth=(1, 1), untagged_ratio=1.0, base_count=1,
+            base_depth=(1, 1), seed=5)
+        tagged = [image for image in images
+                  if image['RepoTags'] != ['<none>:<none>']]
+        self.assertEqual(len(tagged), 1)
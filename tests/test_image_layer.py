@@ -22,6 +22,12 @@ class TestImageLayer(unittest.TestCase):
         """test if identifier is required"""
         self.assertRaises(TypeError, ImageLayer)
 
+    def test_slots(self):
+        """test that layers have no per-instance __dict__"""
+        layer = ImageLayer(generate_valid_identifier())
+        self.assertFalse(hasattr(layer, '__dict__'))
+        self.assertRaises(AttributeError, setattr, layer, 'foo', 'bar')
+
     def test_identifier_prop(self):
         """test the identifier property"""
         identifier = generate_valid_identifier()
@@ -185,6 +191,26 @@ class TestImageLayer(unittest.TestCase):
         self.assertEqual(len(layer_middle2.children), 0)
         self.assertEqual(len(layer_child.children), 0)
 
+    def test_root_prop(self):
+        """test the root property with and without a cached pointer"""
+        layer_head = ImageLayer(identifier=generate_valid_identifier())
+        layer_middle = ImageLayer(identifier=generate_valid_identifier())
+        layer_child = ImageLayer(identifier=generate_valid_identifier())
+        ImageLayer.join_parent_child(parent=layer_head, child=layer_middle)
+        ImageLayer.join_parent_child(parent=layer_middle, child=layer_child)
+        self.assertIs(layer_head.root, layer_head)
+        self.assertIs(layer_middle.root, layer_head)
+        self.assertIs(layer_child.root, layer_head)
+        # a cached pointer is returned without walking the chain
+        layer_child.root = layer_middle
+        self.assertIs(layer_child.root, layer_middle)
+        layer_child.root = None
+        self.assertIs(layer_child.root, layer_head)
+        # removing a layer from the chain drops its cached pointer
+        layer_middle.root = layer_head
+        layer_middle.remove_from_chain()
+        self.assertIs(layer_middle.root, layer_middle)
+
     def test_str(self):
         """test the __str__ function"""
         identifier = generate_valid_identifier()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""Test reading image lists from files"""
+
+import unittest
+import io
+import json
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.helper import generate_random_api_layer
+
+from dockgraph import dockgraph
+from dockgraph import ingest
+
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        """generate some images"""
+        self.images = [generate_random_api_layer() for _ in range(20)]
+        for i, image in enumerate(self.images[:-1]):
+            image['ParentId'] = self.images[i + 1]['Id']
+
+    def test_array(self):
+        """test if a json array is decoded across chunk boundaries"""
+        text = json.dumps(self.images, indent=2)
+        for chunk_size in (1, 7, 4096, len(text)):
+            images = list(ingest.iter_images(
+                io.StringIO(text), chunk_size=chunk_size))
+            self.assertEqual(self.images, images)
+
+    def test_json_lines(self):
+        """test if json lines are decoded"""
+        text = u''.join(json.dumps(image) + u'\n' for image in self.images)
+        images = list(ingest.iter_images(io.StringIO(text), chunk_size=100))
+        self.assertEqual(self.images, images)
+
+    def test_empty(self):
+        """test if empty documents contain no images"""
+        for text in (u'', u'  \n', u'[]', u' [ ] '):
+            self.assertEqual([], list(ingest.iter_images(io.StringIO(text))))
+
+    def test_invalid(self):
+        """test if invalid json raises ValueError"""
+        for text in (u'[{"Id": "a"', u'[{"Id": }]', u'{"Id": "a"} x',
+                     u'[{"Id": "a"} {"Id": "b"}]', u'[{"Id": "a"},]',
+                     u'[{"Id": "a"}', u'[1, "x"]', u'"x"\n'):
+            with self.assertRaises(ValueError):
+                list(ingest.iter_images(io.StringIO(text), chunk_size=4))
+
+    def test_read_images(self):
+        """test if a file is read and analyzed"""
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'images.json')
+            with open(path, 'w') as image_file:
+                json.dump(self.images, image_file)
+            layers = dockgraph.analyze_layers(ingest.read_images(path))
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(len(self.images), len(layers))
+        self.assertEqual(
+            [self.images[-1]['Id']],
+            [layer.identifier for layer in dockgraph.get_heads(layers)],
+        )
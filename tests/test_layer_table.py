@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""Test the LayerTable class"""
+
+import unittest
+import random
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.helper import generate_random_api_layer
+
+from dockgraph import dockgraph
+from dockgraph.LayerTable import LayerTable
+
+
+class TestLayerTable(unittest.TestCase):
+    """Test the LayerTable class"""
+
+    def setUp(self):
+        """generate an api list and analyze it in both representations"""
+        self.api_list = [generate_random_api_layer() for _ in range(30)]
+        for i, api_layer in enumerate(self.api_list[:-1]):
+            if random.random() < 0.8:
+                api_layer['ParentId'] = \
+                    random.choice(self.api_list[i+1:])['Id']
+        self.table = LayerTable.from_images(self.api_list)
+        self.layers = dockgraph.analyze_layers(self.api_list)
+
+    def test_analyze_table_empty(self):
+        """test that an empty image list gives an empty table"""
+        table = dockgraph.analyze_table([])
+        self.assertEqual(0, len(table))
+        self.assertEqual([], list(table.roots()))
+
+    def test_from_images(self):
+        """test that the table contains the same tree as analyze_layers"""
+        self.assertEqual(len(self.table), len(self.layers))
+        for pos, identifier in enumerate(self.table.identifiers):
+            layer = self.layers[identifier]
+            self.assertEqual(self.table.position(identifier), pos)
+            self.assertEqual(self.table.sizes[pos], layer.size)
+            self.assertListEqual(self.table.tags(pos), layer.tags)
+            parent = self.table.parents[pos]
+            if layer.parent is None:
+                self.assertEqual(parent, -1)
+            else:
+                # parents come before their children
+                self.assertLess(parent, pos)
+                self.assertEqual(
+                    self.table.identifiers[parent], layer.parent.identifier)
+            self.assertListEqual(
+                [self.table.identifiers[child]
+                 for child in self.table.children(pos)],
+                [child.identifier for child in layer.children],
+            )
+
+    def test_dangling_parent(self):
+        """test that layers with an unknown parent become heads"""
+        self.api_list[0]['ParentId'] = 'unknown'
+        table = LayerTable.from_images(self.api_list)
+        pos = table.position(self.api_list[0]['Id'])
+        self.assertEqual(table.parents[pos], -1)
+
+    def test_get_heads(self):
+        """test get_heads against dockgraph.get_heads"""
+        self.assertSetEqual(
+            set(self.table.identifiers[pos]
+                for pos in self.table.get_heads()),
+            set(head.identifier for head in dockgraph.get_heads(self.layers))
+        )
+        for identifier in self.table.identifiers:
+            self.assertListEqual(
+                [self.table.identifiers[pos]
+                 for pos in self.table.get_heads(identifier[:20])],
+                [head.identifier for head in
+                 dockgraph.get_heads(self.layers, identifier[:20])]
+            )
+
+    def test_subtree_aggregates(self):
+        """test subtree_counts, subtree_count and subtree_sum"""
+        counts = self.table.subtree_counts()
+        deltas = self.table.deltas()
+        sums = self.table.subtree_sum(deltas)
+        for pos in range(len(self.table)):
+            self.assertEqual(counts[pos], self.table.subtree_count(pos))
+            stack = [pos]
+            count = 0
+            total = 0
+            while stack:
+                cur = stack.pop()
+                count += 1
+                total += deltas[cur]
+                stack.extend(self.table.children(cur))
+            self.assertEqual(counts[pos], count)
+            self.assertEqual(sums[pos], total)
+
+    def test_remove_untagged_layers(self):
+        """test remove_untagged_layers against the linked implementation"""
+        table = self.table.remove_untagged_layers()
+        pruned = dockgraph.prune_untagged_layers(self.layers)
+        self.assertSetEqual(set(table.identifiers), set(pruned.keys()))
+        for pos, identifier in enumerate(table.identifiers):
+            parent = pruned[identifier].parent
+            if parent is None:
+                self.assertEqual(table.parents[pos], -1)
+            else:
+                self.assertEqual(
+                    table.identifiers[table.parents[pos]], parent.identifier)
+
+    def test_to_layers(self):
+        """test materializing the table as ImageLayers"""
+        heads = self.table.to_layers()
+        self.assertListEqual(
+            [dict(head) for head in heads],
+            [dict(self.layers[self.table.identifiers[pos]])
+             for pos in self.table.get_heads()]
+        )
+
+    def test_to_dict(self):
+        """test materializing the table as a dict like analyze_layers"""
+        layers = self.table.to_dict()
+        self.assertListEqual(list(layers), list(self.table.identifiers))
+        for identifier, layer in self.layers.items():
+            self.assertDictEqual(dict(layers[identifier]), dict(layer))
+        head = self.table.get_heads()[-1]
+        layers = self.table.to_dict([head])
+        self.assertEqual(len(layers), self.table.subtree_count(head))
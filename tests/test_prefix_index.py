@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""Test the PrefixIndex class"""
+
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from dockgraph.PrefixIndex import PrefixIndex
+
+
+class TestPrefixIndex(unittest.TestCase):
+    """Test the PrefixIndex class"""
+
+    def setUp(self):
+        """build a small index"""
+        self.index = PrefixIndex([
+            ('abc123', 'abc123'),
+            ('foo/bar:latest', 'abc123'),
+            ('abd456', 'abd456'),
+            ('foo/baz:1.0', 'abd456'),
+            ('zzz999', 'zzz999'),
+        ])
+
+    def test_len(self):
+        """test the number of indexed keys"""
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(len(PrefixIndex()), 0)
+
+    def test_find_unique(self):
+        """test a prefix that matches exactly one layer"""
+        self.assertListEqual(self.index.find('abc'), ['abc123'])
+        self.assertListEqual(self.index.find('foo/baz'), ['abd456'])
+        self.assertListEqual(self.index.find('zzz999'), ['zzz999'])
+
+    def test_find_ambiguous(self):
+        """test a prefix that matches several layers"""
+        self.assertListEqual(self.index.find('ab'), ['abc123', 'abd456'])
+        self.assertListEqual(self.index.find('foo/'), ['abc123', 'abd456'])
+
+    def test_find_missing(self):
+        """test a prefix that matches nothing"""
+        self.assertListEqual(self.index.find('abe'), [])
+        self.assertListEqual(self.index.find('zzzz'), [])
+
+    def test_find_deduplicates(self):
+        """test that a layer matching by id and tag is returned once"""
+        index = PrefixIndex([('foo1', 'foo1'), ('foo:latest', 'foo1')])
+        self.assertListEqual(index.find('foo'), ['foo1'])
+
+    def test_add_remove(self):
+        """test adding and removing keys"""
+        self.index.add('abcd', 'new')
+        self.assertListEqual(self.index.find('abc'), ['abc123', 'new'])
+        self.index.remove('abcd', 'new')
+        self.assertListEqual(self.index.find('abc'), ['abc123'])
+        self.index.remove('foo/bar:latest', 'other')
+        self.assertListEqual(self.index.find('foo/bar'), ['abc123'])
+
+    def test_from_sorted(self):
+        """test an index of keys that are already sorted"""
+        index = PrefixIndex.from_sorted(
+            ('abc123', 'abd456', 'foo/bar:latest'), ('a', 'b', 'a'))
+        self.assertEqual(len(index), 3)
+        self.assertListEqual(index.find('ab'), ['a', 'b'])
+        self.assertListEqual(index.find('foo/'), ['a'])
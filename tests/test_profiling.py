@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""Test the timing of the phases"""
+
+import unittest
+import io
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from dockgraph import profiling
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_span(self):
+        """test if the phases are recorded in order"""
+        profiler = profiling.Profiler()
+        with profiler.span('fetch'):
+            pass
+        with profiler.span('render'):
+            pass
+        self.assertEqual(
+            ['fetch', 'render'], [name for name, _ in profiler.phases])
+        self.assertTrue(all(seconds >= 0 for _, seconds in profiler.phases))
+
+    def test_span_exception(self):
+        """test if a failing phase is recorded"""
+        profiler = profiling.Profiler()
+        with self.assertRaises(ValueError):
+            with profiler.span('analyze'):
+                raise ValueError()
+        self.assertEqual('analyze', profiler.phases[0][0])
+
+    def test_count(self):
+        """test if counters are summed up"""
+        profiler = profiling.Profiler()
+        profiler.count('layers', 3)
+        profiler.count('heads', 1)
+        profiler.count('layers', 2)
+        self.assertEqual([('layers', 5), ('heads', 1)], profiler.counters)
+
+    def test_report(self):
+        """test if the report lists all phases and counters"""
+        profiler = profiling.Profiler()
+        with profiler.span('fetch'):
+            pass
+        profiler.count('layers', 42)
+        report = profiler.report().splitlines()
+        self.assertEqual(4, len(report))
+        self.assertTrue(report[1].startswith('fetch'))
+        self.assertTrue(report[2].startswith('total'))
+        self.assertEqual(['layers', '42'], report[3].split())
+
+    def test_cprofile_dump(self):
+        """test if the cProfile stats are written on stop"""
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'out.prof')
+            profiler = profiling.Profiler(cprofile_path=path)
+            profiler.stop()
+            self.assertTrue(os.path.isfile(path))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_null_profiler(self):
+        """test if the null profiler does nothing"""
+        profiler = profiling.NullProfiler()
+        self.assertFalse(profiler.enabled)
+        with profiler.span('fetch'):
+            profiler.count('layers', 1)
+        profiler.stop()
+
+    def test_counting_writer(self):
+        """test if the written bytes are counted"""
+        stream = io.StringIO()
+        writer = profiling.CountingWriter(stream)
+        writer.write(u'ab')
+        writer.write(u'└')
+        self.assertEqual(u'ab└', stream.getvalue())
+        self.assertEqual(5, writer.written)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""Test the query server"""
+
+import unittest
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.helper import generate_random_api_layer
+
+from dockgraph import dockgraph
+from dockgraph import server
+from dockgraph.printer import print_tree
+
+
+class TestServer(unittest.TestCase):
+    """Test the query server"""
+
+    def setUp(self):
+        """start a server on a temporary socket"""
+        self.api_list = [generate_random_api_layer() for _ in range(15)]
+        for i, api_layer in enumerate(self.api_list[:-1]):
+            api_layer['ParentId'] = self.api_list[i + 1]['Id']
+        self.api_list[-1]['RepoTags'] = ['base:latest']
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, 'dockgraph.sock')
+        self.server = server.GraphServer(
+            self.socket_path, fetch=lambda: self.api_list)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        """stop the server"""
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def query(self, images, **kwargs):
+        """:return: the header and the output of a query"""
+        stream = io.StringIO()
+        header = server.query(
+            images, stream=stream, socket_path=self.socket_path, **kwargs)
+        return header, stream.getvalue()
+
+    def test_query_all(self):
+        """test that the server renders the same tree as print_tree"""
+        layers = dockgraph.analyze_layers(self.api_list)
+        for output_format in ('text', 'json', 'ndjson'):
+            header, output = self.query(
+                [], intermediate=True, output_format=output_format)
+            self.assertListEqual(header['notes'], [])
+            self.assertEqual(output, print_tree(
+                dockgraph.get_heads(layers), output_format=output_format))
+
+    def test_query_image(self):
+        """test a query for a single image"""
+        header, output = self.query(['base:latest'], encoding='utf-8')
+        tagged = dockgraph.prune_untagged_layers(
+            dockgraph.analyze_layers(self.api_list))
+        self.assertEqual(output, print_tree(
+            dockgraph.get_heads(tagged, 'base:latest'), encoding='utf-8'))
+
+    def test_query_sizes(self):
+        """test a query with the subtree sizes of the full tree"""
+        header, output = self.query(
+            ['base:latest'], output_format='ndjson', sizes=True)
+        layers = dockgraph.analyze_layers(self.api_list)
+        dockgraph.compute_subtree_sizes(layers)
+        tagged = dockgraph.prune_untagged_layers(layers)
+        self.assertEqual(output, print_tree(
+            dockgraph.get_heads(tagged, 'base:latest'),
+            output_format='ndjson', sizes=True))
+
+    def test_query_focus(self):
+        """test a query for the path to an image"""
+        image = self.api_list[5]['Id'][:12]
+        header, output = self.query([image], intermediate=True, focus=True)
+        layers = dockgraph.analyze_layers(self.api_list)
+        focus = dockgraph.focus_layers(dockgraph.find_layers(layers, image))
+        self.assertEqual(output, print_tree(
+            focus.heads, children=focus.children))
+        self.assertEqual(10, len(output.splitlines()) - 2)
+
+    def test_query_missing(self):
+        """test a query for an unknown image"""
+        header, output = self.query(['unknown', 'base:latest', 'other'])
+        self.assertEqual(
+            'No image found with id/name unknown.\n'
+            'No image found with id/name other.', header['error'])
+        self.assertEqual(output, '')
+
+    def test_query_failed(self):
+        """test that a failing query is answered with an error"""
+        header, output = self.query([], output_format='xml')
+        self.assertIn('xml', header['error'])
+        self.assertEqual(output, '')
+        header, _ = self.query([], intermediate=True)
+        self.assertEqual([], header['notes'])
+
+    def _silent_server(self, close):
+        """
+        :param close: close every connection at once instead of keeping it
+            open without answering
+        :return: the socket path of a server that never writes a header
+        """
+        socket_path = os.path.join(self.tmpdir, 'silent.sock')
+        listener = server.socket.socket(
+            server.socket.AF_UNIX, server.socket.SOCK_STREAM)
+        listener.bind(socket_path)
+        listener.listen(1)
+        self.addCleanup(listener.close)
+        connections = []
+
+        def accept():
+            """accept one connection"""
+            connection = listener.accept()[0]
+            if close:
+                connection.makefile('rb').readline()
+                connection.close()
+            else:
+                connections.append(connection)
+
+        thread = threading.Thread(target=accept)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(lambda: [conn.close() for conn in connections])
+        return socket_path
+
+    def test_query_no_header(self):
+        """test that a connection closed without a header is an error"""
+        self.assertRaises(
+            ValueError, server.query, [], stream=io.StringIO(),
+            socket_path=self._silent_server(close=True))
+
+    def test_query_timeout(self):
+        """test that a client does not wait forever for a hung server"""
+        self.assertRaises(
+            server.socket.error, server.query, [], stream=io.StringIO(),
+            socket_path=self._silent_server(close=False), timeout=0.2)
+
+    def test_refresh(self):
+        """test that refresh serves the new image list"""
+        self.api_list.append(generate_random_api_layer())
+        self.server.refresh()
+        _, output = self.query([], intermediate=True)
+        self.assertIn(
+            '{0} layers'.format(len(self.api_list)), output.splitlines()[-1])
+
+    def test_default_socket_path(self):
+        """test that the socket is not put into the temp directory itself"""
+        runtime_dir = os.environ.pop('XDG_RUNTIME_DIR', None)
+        try:
+            path = server.default_socket_path()
+            directory = 'dockgraph-{0}'.format(os.getuid())
+            self.assertEqual(
+                os.path.join(tempfile.gettempdir(), directory),
+                os.path.dirname(path))
+            os.environ['XDG_RUNTIME_DIR'] = self.tmpdir
+            self.assertEqual(
+                self.tmpdir, os.path.dirname(server.default_socket_path()))
+        finally:
+            if runtime_dir is None:
+                os.environ.pop('XDG_RUNTIME_DIR', None)
+            else:
+                os.environ['XDG_RUNTIME_DIR'] = runtime_dir
+
+    def test_private_directory(self):
+        """test that a missing directory of the socket is private"""
+        socket_path = os.path.join(self.tmpdir, 'private', 'dockgraph.sock')
+        other = server.GraphServer(socket_path, fetch=lambda: self.api_list)
+        try:
+            self.assertEqual(
+                0o700, os.stat(os.path.dirname(socket_path)).st_mode & 0o777)
+        finally:
+            other.server_close()
+
+    @unittest.skipUnless(os.getuid() == 0, 'needs root to chown the socket')
+    def test_foreign_socket(self):
+        """test that a socket of another user is not asked"""
+        os.chown(self.socket_path, 1, -1)
+        self.assertRaises(server.socket.error, self.query, [])
+
+    def test_socket_in_use(self):
+        """test that a second server does not take over the socket"""
+        self.assertRaises(
+            server.socket.error, server.GraphServer,
+            self.socket_path, fetch=lambda: self.api_list)
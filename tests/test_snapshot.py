@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""Test the binary snapshots of layer tables"""
+
+import unittest
+import random
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.helper import generate_random_api_layer
+
+from dockgraph import snapshot
+from dockgraph.LayerTable import LayerTable
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test the binary snapshots of layer tables"""
+
+    def setUp(self):
+        """generate a table and save it"""
+        self.api_list = [generate_random_api_layer() for _ in range(30)]
+        for i, api_layer in enumerate(self.api_list[:-1]):
+            if random.random() < 0.8:
+                api_layer['ParentId'] = \
+                    random.choice(self.api_list[i+1:])['Id']
+        self.api_list[0]['RepoTags'] = [u'ünicode:1', u'ünicode:2']
+        self.table = LayerTable.from_images(self.api_list)
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'layers.snapshot')
+        snapshot.save(self.table, self.path)
+        self.loaded = snapshot.load(self.path)
+
+    def tearDown(self):
+        """remove the snapshot"""
+        shutil.rmtree(self.tmpdir)
+
+    def test_columns(self):
+        """test that the loaded table has the columns of the saved one"""
+        self.assertEqual(len(self.loaded), len(self.table))
+        self.assertListEqual(
+            list(self.loaded.identifiers), self.table.identifiers)
+        self.assertListEqual(
+            list(self.loaded.parents), list(self.table.parents))
+        self.assertListEqual(list(self.loaded.sizes), list(self.table.sizes))
+        for pos in range(len(self.table)):
+            self.assertListEqual(self.loaded.tags(pos), self.table.tags(pos))
+            self.assertListEqual(
+                list(self.loaded.children(pos)),
+                list(self.table.children(pos)))
+        self.assertListEqual(
+            list(self.loaded.roots()), list(self.table.roots()))
+
+    def test_get_heads(self):
+        """test that the stored index resolves ids and tags"""
+        self.assertListEqual(self.loaded.get_heads(), self.table.get_heads())
+        for image in self.api_list:
+            for spec in [image['Id'][:8]] + image['RepoTags']:
+                self.assertListEqual(
+                    self.loaded.get_heads(spec), self.table.get_heads(spec))
+        self.assertListEqual(self.loaded.get_heads('missing'), [])
+
+    def test_to_layers(self):
+        """test materializing the loaded table"""
+        self.assertListEqual(
+            [dict(head) for head in self.loaded.to_layers()],
+            [dict(head) for head in self.table.to_layers()],
+        )
+
+    def test_save_loaded(self):
+        """test that a loaded snapshot can be saved again"""
+        path = os.path.join(self.tmpdir, 'copy.snapshot')
+        snapshot.save(self.loaded, path)
+        with open(self.path, 'rb') as original, open(path, 'rb') as copy:
+            self.assertEqual(original.read(), copy.read())
+
+    def test_empty(self):
+        """test a snapshot without layers"""
+        snapshot.save(LayerTable.from_images([]), self.path)
+        table = snapshot.load(self.path)
+        self.assertEqual(len(table), 0)
+        self.assertListEqual(table.get_heads(), [])
+        self.assertListEqual(table.get_heads('abc'), [])
+
+    def test_invalid(self):
+        """test that other files are rejected"""
+        with open(self.path, 'wb') as snapshot_file:
+            snapshot_file.write(b'[]\n')
+        with self.assertRaises(ValueError):
+            snapshot.load(self.path)
+
+    def _rewrite_header(self, change):
+        """
+        :param change: function changing the decoded header of the snapshot
+        """
+        import json
+        with open(self.path, 'rb') as snapshot_file:
+            magic = snapshot_file.readline()
+            header = json.loads(snapshot_file.readline().decode('utf-8'))
+            snapshot_file.seek((snapshot_file.tell() + 7) // 8 * 8)
+            data = snapshot_file.read()
+        change(header)
+        line = json.dumps(header).encode('utf-8') + b'\n'
+        padding = -(len(magic) + len(line)) % 8
+        with open(self.path, 'wb') as snapshot_file:
+            snapshot_file.write(magic + line + b'\0' * padding + data)
+
+    def test_corrupt(self):
+        """test that columns outside the file or of bad length are rejected"""
+        self._rewrite_header(lambda header: None)
+        self.assertEqual(
+            self.table.identifiers, list(snapshot.load(self.path).identifiers))
+
+        def grow(header):
+            header['columns']['string_data'][3] += 1
+        self._rewrite_header(grow)
+        with self.assertRaises(ValueError):
+            snapshot.load(self.path)
+
+        def count(header):
+            header['columns']['string_data'][3] -= 1
+            header['strings'] += 1
+        self._rewrite_header(count)
+        with self.assertRaises(ValueError):
+            snapshot.load(self.path)
+
+        with open(self.path, 'rb') as snapshot_file:
+            data = snapshot_file.read()
+        with open(self.path, 'wb') as snapshot_file:
+            snapshot_file.write(data[:-100])
+        with self.assertRaises(ValueError):
+            snapshot.load(self.path)
+
+    def test_save_mode(self):
+        """test that the snapshot gets the mode of a file created by open"""
+        umask = os.umask(0o022)
+        try:
+            snapshot.save(self.table, self.path)
+        finally:
+            os.umask(umask)
+        self.assertEqual(0o644, os.stat(self.path).st_mode & 0o777)
+
+    def test_save_failed(self):
+        """test that no temporary file is left if saving fails"""
+        def fail(column):
+            raise IOError('disk full')
+        tobytes = snapshot._tobytes
+        snapshot._tobytes = fail
+        try:
+            with self.assertRaises(IOError):
+                snapshot.save(self.table, os.path.join(self.tmpdir, 'new'))
+        finally:
+            snapshot._tobytes = tobytes
+        self.assertEqual(['layers.snapshot'], os.listdir(self.tmpdir))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""Test which modules the cli imports at startup"""
+
+import unittest
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from tests.helper import generate_random_api_layer
+
+from dockgraph import cache
+
+ROOTDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(code, env=None):
+    """
+    run code in a new interpreter with -X importtime
+    :param code: python code to run
+    :param env: additional environment variables
+    :return: cumulative import time in microseconds of each imported module
+    :rtype: dict
+    """
+    environ = dict(os.environ)
+    environ.update(env or {})
+    proc = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOTDIR, env=environ,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    _, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(stderr.decode('utf-8'))
+    times = {}
+    for line in stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'needs -X importtime and PEP 562')
+class TestStartup(unittest.TestCase):
+    """Test which modules the cli imports at startup"""
+
+    def test_parse_args(self):
+        """test that parsing the arguments doesn't load docker or the graph"""
+        times = import_times(
+            'from bin import dockgraph_cli as cli; cli.parse_args([])')
+        self.assertIn('bin.dockgraph_cli', times)
+        for module in ('docker', 'json', 'dockgraph.dockgraph'):
+            self.assertNotIn(module, times)
+
+    def test_completion(self):
+        """test that completing from the cache only loads the cache"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            cache.store(
+                [generate_random_api_layer() for _ in range(5)],
+                path=os.path.join(tmpdir, 'dockgraph', 'images.json'),
+            )
+            times = import_times(
+                'from bin import dockgraph_cli as cli; '
+                'assert list(cli.image_completer(""))',
+                env={'XDG_CACHE_HOME': tmpdir},
+            )
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertIn('dockgraph.cache', times)
+        for module in ('docker', 'dockgraph.dockgraph', 'dockgraph.printer'):
+            self.assertNotIn(module, times)